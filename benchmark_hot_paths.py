@@ -0,0 +1,360 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource # Peak RSS of the stage processes; not available on Windows
+except ImportError:
+    resource = None
+
+# --- Configuration ---
+# Stages to run (None = all of STAGES, in order)
+stages = None
+# Size of the synthetic inputs. They are generated from a fixed seed, so the same
+# settings always produce the same data.
+bible_chapters_per_book = 20
+bible_verses_per_chapter = 25
+trait_count = 20000
+prompt_count = 2000
+query_count = 200
+image_count = 16
+image_size = 1024
+url_count = 300
+seed = 0
+# Every stage is timed this many times and the fastest sample is reported. Stages
+# faster than min_sample_seconds are run several times per sample (like timeit), so
+# short stages are not lost in timer and scheduling noise.
+repeat = 5
+min_sample_seconds = 0.2
+# Results are compared with this file when it exists. A stage that got slower or
+# needed more memory than baseline * (1 + tolerance) counts as a regression and
+# makes the script exit with status 1.
+baseline_file = 'benchmark_baseline.json'
+tolerance = 0.20
+# Write the results of this run as the new baseline instead of comparing
+update_baseline = False
+# Optional JSON file for the full results of this run
+report_file = None
+# --- End Configuration ---
+
+WORDS = ('and the of that he unto I his in shall they for be him not them is with all thou '
+         'thy was which my LORD me said but ye their have will thee from as are when this out '
+         'were by upon man Israel king son hath people house God came up day land went children').split()
+TRAIT_WORDS = ('calm bright dark jazz piano storm happy sad loud soft epic retro neon forest ocean urban '
+               'dream fire ice gold slow fast warm cold vintage modern lush sparse gritty clean').split()
+
+# --- Synthetic inputs ---
+
+# Write one aruljohn/Bible-kjv style JSON file per KJV book. Verses are shuffled
+# within each chapter and numbers are strings, as in the real files, so the
+# converter has its usual sorting and parsing work to do. Returns the verse count.
+def write_bible_tree(directory, chapters_per_book, verses_per_chapter, rng):
+    from bible_reorder import KJV_BOOK_ORDER
+    os.makedirs(directory, exist_ok=True)
+    for book_name in KJV_BOOK_ORDER:
+        chapters = []
+        for chapter in range(1, chapters_per_book + 1):
+            verses = [{"verse": str(verse), "text": ' '.join(rng.choices(WORDS, k=rng.randint(8, 40)))}
+                      for verse in range(1, verses_per_chapter + 1)]
+            rng.shuffle(verses)
+            chapters.append({"chapter": str(chapter), "verses": verses})
+        with open(os.path.join(directory, book_name.replace(' ', '') + '.json'), 'w', encoding='utf-8') as file:
+            json.dump({"book": book_name, "chapters": chapters}, file)
+    return len(KJV_BOOK_ORDER) * chapters_per_book * verses_per_chapter
+
+def make_trait_descriptions(count, rng):
+    return [' '.join(rng.choices(TRAIT_WORDS, k=rng.randint(3, 12))) + f" variant {index}" for index in range(count)]
+
+# Logos with soft shapes on a transparent background, like the usual favicon sources
+def write_images(directory, count, size, rng):
+    from PIL import Image, ImageDraw
+    os.makedirs(directory, exist_ok=True)
+    for index in range(count):
+        image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            left, top = rng.randrange(size // 2), rng.randrange(size // 2)
+            box = [left, top, left + rng.randrange(size // 8, size // 2), top + rng.randrange(size // 8, size // 2)]
+            draw.ellipse(box, fill=tuple(rng.randrange(256) for _ in range(4)))
+        image.save(os.path.join(directory, f"logo{index:04d}.png"))
+
+def make_urls(count, rng):
+    return [f"https://tickets.example.com/event/{rng.randrange(1000):04d}/seat/{index:06d}?code="
+            + ''.join(rng.choices('ABCDEFGHJKLMNPQRSTUVWXYZ23456789', k=12)) for index in range(count)]
+
+# Generate every input the stages need into workspace. Returns the settings the
+# stages read, which are also stored with the results to keep comparisons fair.
+def prepare_workspace(workspace):
+    rng = random.Random(seed)
+    bible_directory = os.path.join(workspace, 'Bible')
+    verse_count = write_bible_tree(bible_directory, bible_chapters_per_book, bible_verses_per_chapter, rng)
+    with open(os.path.join(workspace, 'traits.json'), 'w', encoding='utf-8') as file:
+        json.dump(make_trait_descriptions(trait_count, rng), file)
+    write_images(os.path.join(workspace, 'images'), image_count, image_size, rng)
+    with open(os.path.join(workspace, 'urls.json'), 'w', encoding='utf-8') as file:
+        json.dump(make_urls(url_count, rng), file)
+    return {
+        'workspace': workspace, 'bible_directory': bible_directory, 'verse_count': verse_count,
+        'chapters_per_book': bible_chapters_per_book, 'verses_per_chapter': bible_verses_per_chapter,
+        'trait_count': trait_count, 'prompt_count': prompt_count, 'query_count': query_count,
+        'image_count': image_count, 'image_size': image_size, 'url_count': url_count, 'seed': seed,
+    }
+
+# --- Stages ---
+# Each stage does its (untimed) setup from the workspace and returns (run, items,
+# input settings): run() is the timed work, items the number of things it handles.
+
+# What the build does per book file: decode the raw bytes and convert them, through
+# the schema decoder (decode_books / convert_book_unchecked) when it applies
+def stage_bible_decode(settings):
+    from bible_metrics import ConsoleMetrics
+    from bible_reorder import convert_book_bytes
+    sources = []
+    for file_name in sorted(os.listdir(settings['bible_directory'])):
+        with open(os.path.join(settings['bible_directory'], file_name), 'rb') as file:
+            sources.append((file_name, file.read()))
+    metrics = ConsoleMetrics()
+    def run():
+        for file_name, raw_data in sources:
+            convert_book_bytes(raw_data, file_name, metrics)
+    return run, settings['verse_count'], ('chapters_per_book', 'verses_per_chapter')
+
+# The checked converter, which the build falls back to for books the schema
+# decoder rejects
+def stage_bible_convert(settings):
+    from bible_reorder import convert_book_json_to_js
+    books = []
+    for file_name in sorted(os.listdir(settings['bible_directory'])):
+        with open(os.path.join(settings['bible_directory'], file_name), 'r', encoding='utf-8') as file:
+            books.append(json.load(file))
+    def run():
+        for book in books:
+            convert_book_json_to_js(book)
+    return run, settings['verse_count'], ('chapters_per_book', 'verses_per_chapter')
+
+def stage_bible_serialize(settings):
+    from bible_reorder import KJV_BOOK_ORDER, convert_book_json_to_js, serialize_book_fragment
+    books = {}
+    for file_name in os.listdir(settings['bible_directory']):
+        with open(os.path.join(settings['bible_directory'], file_name), 'r', encoding='utf-8') as file:
+            books.update(convert_book_json_to_js(json.load(file)))
+    def run():
+        for book_name in KJV_BOOK_ORDER:
+            serialize_book_fragment(book_name, books[book_name])
+    return run, settings['verse_count'], ('chapters_per_book', 'verses_per_chapter')
+
+def stage_bible_build(settings):
+    from bible_reorder import build_bible
+    output_path = os.path.join(settings['workspace'], 'bible.html')
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_bible(settings['bible_directory'], output_path, build_cache_directory=None, ingest_workers=1)
+    return run, settings['verse_count'], ('chapters_per_book', 'verses_per_chapter')
+
+# A rebuild with a warm build cache and no changed inputs
+def stage_bible_rebuild(settings):
+    from bible_reorder import build_bible
+    output_path = os.path.join(settings['workspace'], 'bible-cached.html')
+    cache_directory = os.path.join(settings['workspace'], 'build_cache')
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_bible(settings['bible_directory'], output_path, build_cache_directory=cache_directory,
+                        ingest_workers=1)
+    run()
+    return run, settings['verse_count'], ('chapters_per_book', 'verses_per_chapter')
+
+def load_traits(settings):
+    with open(os.path.join(settings['workspace'], 'traits.json'), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def stage_trait_vectorize(settings):
+    from orthogonal_hd_vector_space_prompt_engineering_tool import OrthogonalPromptEngine
+    descriptions = load_traits(settings)
+    def run():
+        # A fresh engine each time, so the trigram cache starts cold
+        OrthogonalPromptEngine().vectorize_traits(descriptions)
+    return run, len(descriptions), ('trait_count',)
+
+def trait_engine(settings):
+    from orthogonal_hd_vector_space_prompt_engineering_tool import OrthogonalPromptEngine
+    descriptions = load_traits(settings)
+    engine = OrthogonalPromptEngine(initial_capacity=len(descriptions))
+    engine.add_traits([f"trait{index}" for index in range(len(descriptions))], descriptions)
+    return engine
+
+def stage_trait_generate_prompt(settings):
+    engine = trait_engine(settings)
+    rng = random.Random(settings['seed'])
+    selections = [rng.sample(engine.trait_names, 5) for _ in range(settings['prompt_count'])]
+    def run():
+        for selection in selections:
+            engine.generate_prompt(selection)
+    return run, len(selections), ('trait_count', 'prompt_count')
+
+def stage_trait_nearest(settings):
+    engine = trait_engine(settings)
+    rng = random.Random(settings['seed'])
+    queries = rng.sample(engine.trait_names, settings['query_count'])
+    def run():
+        for query in queries:
+            engine.nearest_traits(query, k=10, exact=True)
+    return run, len(queries), ('trait_count', 'query_count')
+
+def stage_favicon_batch(settings):
+    import generate_favicon
+    sources = generate_favicon.list_batch_sources(os.path.join(settings['workspace'], 'images'))
+    output_directory = os.path.join(settings['workspace'], 'favicons')
+    def run():
+        # Start from an empty output directory so nothing is skipped as cached
+        shutil.rmtree(output_directory, ignore_errors=True)
+        generate_favicon.build_icon_sets(sources, output_directory, generate_favicon.icon_sizes,
+                                         generate_favicon.png_sizes, generate_favicon.apple_touch_size, workers=1)
+    return run, len(sources), ('image_count', 'image_size')
+
+def stage_qr_encode(settings):
+    import generate_qr_code
+    with open(os.path.join(settings['workspace'], 'urls.json'), 'r', encoding='utf-8') as file:
+        records = [(None, url) for url in json.load(file)]
+    output_path = os.path.join(settings['workspace'], 'qr_codes.pdf')
+    def run():
+        writer = generate_qr_code.PdfSheetWriter(output_path)
+        generate_qr_code.generate_codes(records, writer, workers=1)
+        writer.close()
+    return run, len(records), ('url_count',)
+
+STAGES = {
+    'bible_decode': stage_bible_decode,
+    'bible_convert': stage_bible_convert,
+    'bible_serialize': stage_bible_serialize,
+    'bible_build': stage_bible_build,
+    'bible_rebuild': stage_bible_rebuild,
+    'trait_vectorize': stage_trait_vectorize,
+    'trait_generate_prompt': stage_trait_generate_prompt,
+    'trait_nearest': stage_trait_nearest,
+    'favicon_batch': stage_favicon_batch,
+    'qr_encode': stage_qr_encode,
+}
+
+# --- Measurement ---
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # kilobytes on Linux
+
+# Runs in a fresh process per stage, so peak RSS belongs to that stage alone (plus
+# the interpreter and imports). Timing runs go first; one more run under
+# tracemalloc gives the peak of Python-level allocations (NumPy included).
+def measure_stage(name, settings, repeat, min_sample_seconds):
+    run, items, input_keys = STAGES[name](settings)
+    start = time.perf_counter()
+    run() # Warm-up, also used to size the samples
+    runs_per_sample = max(1, int(min_sample_seconds / max(time.perf_counter() - start, 1e-9)))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(runs_per_sample):
+            run()
+        timings.append((time.perf_counter() - start) / runs_per_sample)
+    tracemalloc.start()
+    try:
+        run()
+        traced_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    seconds = min(timings)
+    return {
+        'seconds': seconds, 'items': items, 'items_per_second': items / seconds if seconds else None,
+        'traced_peak_bytes': traced_peak, 'peak_rss_bytes': peak_rss_bytes(),
+        'inputs': {key: settings[key] for key in input_keys},
+    }
+
+def run_stages(stage_names, settings, repeat, min_sample_seconds):
+    # 'spawn' keeps the parent's memory out of the stage processes' RSS
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for name in stage_names:
+        with context.Pool(processes=1) as pool:
+            results[name] = pool.apply(measure_stage, (name, settings, repeat, min_sample_seconds))
+        result = results[name]
+        print(f"{name:<24} {result['seconds'] * 1000:10.1f} ms {result['items_per_second']:14,.0f} items/s "
+              f"{format_bytes(result['traced_peak_bytes']):>10} traced {format_bytes(result['peak_rss_bytes']):>10} RSS")
+    return results
+
+def format_bytes(size):
+    if size is None:
+        return 'n/a'
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+# Return a list of regression messages. Stages run with different input settings
+# than their baseline are reported and left out of the comparison.
+def compare_with_baseline(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name}: no baseline")
+            continue
+        if reference.get('inputs') != result['inputs']:
+            print(f"{name}: inputs differ from the baseline ({reference.get('inputs')}), not compared")
+            continue
+        for key in ('seconds', 'traced_peak_bytes', 'peak_rss_bytes'):
+            if reference.get(key) and result[key] is not None:
+                ratio = result[key] / reference[key]
+                if ratio > 1 + tolerance:
+                    regressions.append(f"{name}: {key} {ratio:.2f}x the baseline "
+                                       f"({result[key]:.4g} against {reference[key]:.4g})")
+    return regressions
+
+if __name__ == '__main__':
+    # The stages import the scripts from the current directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    stage_names = stages or list(STAGES)
+    unknown = [name for name in stage_names if name not in STAGES]
+    if unknown:
+        sys.exit(f"Unknown stages: {', '.join(unknown)} (expected some of {', '.join(STAGES)})")
+
+    workspace = tempfile.mkdtemp(prefix='benchmark_hot_paths-')
+    try:
+        print(f"Generating synthetic inputs in '{workspace}'...")
+        settings = prepare_workspace(workspace)
+        results = run_stages(stage_names, settings, repeat, min_sample_seconds)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    if report_file:
+        with open(report_file, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4)
+    if update_baseline:
+        baseline = {}
+        if os.path.exists(baseline_file):
+            with open(baseline_file, 'r', encoding='utf-8') as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(baseline_file, 'w', encoding='utf-8') as file:
+            json.dump(baseline, file, indent=4)
+        print(f"Baseline saved as '{baseline_file}'.")
+    elif os.path.exists(baseline_file):
+        with open(baseline_file, 'r', encoding='utf-8') as file:
+            regressions = compare_with_baseline(results, json.load(file), tolerance)
+        if regressions:
+            print("Performance regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against '{baseline_file}' (tolerance {tolerance:.0%}).")
+    else:
+        print(f"No baseline found at '{baseline_file}'. Set update_baseline = True to record one.")
@@ -0,0 +1,145 @@
+import json
+import os
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool, cpu_count
+
+from bible_reorder import KJV_BOOK_ORDER, build_bible
+from bible_verse_store import VerseStore, normalize_book_name
+
+# --- Configuration ---
+# Translations to build: (input directory, output HTML file[, label]). Each input
+# directory is shaped like the 'Bible' directory read by bible_reorder.py. The label
+# names the translation in the aligned output and defaults to the directory name.
+translations = [
+    ('Bible', 'bible.html', 'KJV'),
+]
+# Number of translations built at the same time (None = one per CPU core)
+batch_workers = None
+# Settings passed to bible_reorder.build_bible for every translation. The build cache
+# is shared, so book files that are identical across translations are only
+# converted once. Outputs are per translation: a verse_store_file or
+# search_index_file set here only switches that output on, and each translation
+# writes it next to its HTML file as '<output>.verses' / '<output>.search'. Shards
+# go into a subdirectory of shard_directory named after each HTML file.
+build_settings = {
+    'output_mode': 'inline',
+    'shard_directory': 'bible_data',
+    'build_cache_directory': '.bible_build_cache',
+}
+# Optional JSON file holding every verse side by side across all translations, for
+# parallel views. Needs a verse store per translation, written next to each output
+# HTML file as '<output>.verses'.
+aligned_output_file = None # e.g. 'bible_aligned.json'
+# --- End Configuration ---
+
+def translation_label(translation):
+    return translation[2] if len(translation) > 2 else os.path.basename(os.path.normpath(translation[0]))
+
+def verse_store_path(translation):
+    return translation[1] + '.verses'
+
+def search_index_path(translation):
+    return translation[1] + '.search'
+
+# Runs in the batch workers: build one translation. Each translation is built
+# serially inside its worker (pool workers cannot start pools of their own) and the
+# parallelism comes from building many translations at once.
+def build_translation(translation, settings, with_verse_store):
+    input_json_directory, output_html_file = translation[0], translation[1]
+    with_verse_store = with_verse_store or settings.get('verse_store_file')
+    settings = dict(settings, ingest_workers=1,
+                    verse_store_file=verse_store_path(translation) if with_verse_store else None,
+                    search_index_file=search_index_path(translation) if settings.get('search_index_file') else None)
+    return translation, build_bible(input_json_directory, output_html_file, **settings)
+
+# Write {"translations": [...], "books": {book: {"chapters": [{"chapter", "verses":
+# [{"verse", "texts": [...]}]}]}}} with one text per translation (null where a
+# translation lacks the verse). Books are read from the verse stores and written
+# one at a time in KJV order, so memory does not grow with the number of books.
+def write_aligned_translations(labels, store_paths, output_path):
+    stores = [VerseStore(path) for path in store_paths]
+    temp_path = output_path + '.tmp'
+    books_written = 0
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write('{"translations":')
+            file.write(json.dumps(labels, ensure_ascii=False))
+            file.write(',"books":{')
+            for book_name in KJV_BOOK_ORDER:
+                key = normalize_book_name(book_name)
+                present = [store for store in stores if key in store.book_index]
+                if not present:
+                    continue
+                chapters = []
+                for chapter in range(max(store.chapter_count(book_name) for store in present) + 1):
+                    texts_by_verse = {}
+                    for position, store in enumerate(stores):
+                        if store not in present or chapter > store.chapter_count(book_name):
+                            continue
+                        for verse, text in store.verses(book_name, chapter):
+                            texts_by_verse.setdefault(verse, [None] * len(stores))[position] = text
+                    if texts_by_verse:
+                        chapters.append({"chapter": chapter, "verses": [
+                            {"verse": verse, "texts": texts_by_verse[verse]} for verse in sorted(texts_by_verse)
+                        ]})
+                if books_written:
+                    file.write(',')
+                file.write(json.dumps(book_name, ensure_ascii=False))
+                file.write(':')
+                file.write(json.dumps({"chapters": chapters}, ensure_ascii=False, separators=(',', ':')))
+                books_written += 1
+            file.write('}}')
+        os.replace(temp_path, output_path)
+    finally:
+        for store in stores:
+            store.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return books_written
+
+# Build every translation across a process pool, then optionally align them.
+# Returns {output HTML file: result of build_bible}.
+def build_translations(translations, workers=None, settings=None, aligned_output_file=None):
+    settings = dict(settings or {})
+    outputs = Counter(os.path.abspath(translation[1]) for translation in translations)
+    duplicates = sorted(path for path, count in outputs.items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Several translations would be written to the same output file: {', '.join(duplicates)}")
+    with_verse_store = bool(aligned_output_file)
+    build = partial(build_translation, settings=settings, with_verse_store=with_verse_store)
+    workers = min(workers or cpu_count(), len(translations)) or 1
+
+    results = {}
+    if workers == 1:
+        finished = map(build, translations)
+    else:
+        pool = Pool(processes=workers)
+        finished = pool.imap_unordered(build, translations)
+    try:
+        for translation, books_written in finished:
+            results[translation[1]] = books_written
+            print(f"Finished '{translation_label(translation)}' -> '{translation[1]}'")
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+
+    if aligned_output_file:
+        # None means the translation was already up to date (unless its input directory
+        # is gone); 0 means its build failed. A verse store left over from an earlier
+        # run must not stand in for a translation that was not built.
+        built = [translation for translation in translations
+                 if results[translation[1]] != 0 and os.path.isdir(translation[0])
+                 and os.path.exists(verse_store_path(translation))]
+        if not built:
+            print(f"No verse stores were written. Aligned output '{aligned_output_file}' not created.")
+        else:
+            books = write_aligned_translations([translation_label(translation) for translation in built],
+                                               [verse_store_path(translation) for translation in built],
+                                               aligned_output_file)
+            print(f"Aligned {books} books across {len(built)} translations into '{aligned_output_file}'.")
+    return results
+
+if __name__ == '__main__':
+    build_translations(translations, batch_workers, build_settings, aligned_output_file)
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+
+# Bump when the layout of the index or the entry files changes
+CACHE_FORMAT_VERSION = 1
+
+# Hash the contents of a file in blocks so large inputs are never read into memory at once
+def hash_file(file_path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Fingerprint the scripts that produce the cached payloads. Used as part of the cache
+# variant so that editing the converter automatically invalidates old entries.
+def source_fingerprint(*source_paths):
+    digest = hashlib.blake2b(digest_size=8)
+    for source_path in source_paths:
+        with open(source_path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+# Persistent on-disk cache of converted book files for incremental rebuilds.
+#
+# The index (index.json, or <index_name>.json) records, per input file path, the mtime/size seen last time and the hash
+# of its contents, plus the build key of every output written. The converted payload
+# of a file is stored under entries/<variant>-<content hash>.json, so unchanged files
+# (or identical files in other translation directories) are never parsed twice.
+# A file is only re-read and hashed when its mtime or size changed, which keeps a
+# no-op rebuild down to one stat() call per input file. Builds that may run at the
+# same time (e.g. one per translation) should use their own index_name; they still
+# share the entries.
+class BookBuildCache:
+    def __init__(self, cache_directory, variant, index_name='index'):
+        self.cache_directory = cache_directory
+        self.variant = variant
+        self.entries_directory = os.path.join(cache_directory, 'entries')
+        self.index_path = os.path.join(cache_directory, f"{index_name}.json")
+        self.files = {}
+        self.outputs = {}
+        self.dirty = False
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return # Missing or unreadable index: start with an empty cache
+        if index.get('version') == CACHE_FORMAT_VERSION:
+            self.files = index.get('files', {})
+            self.outputs = index.get('outputs', {})
+
+    def _entry_path(self, content_hash):
+        return os.path.join(self.entries_directory, f"{self.variant}-{content_hash}.json")
+
+    # Return {file_path: content_hash} for the given files, in the given order.
+    # Files whose mtime and size match the index reuse the recorded hash.
+    def fingerprint_files(self, file_paths):
+        hashes = {}
+        for file_path in file_paths:
+            key = os.path.abspath(file_path)
+            stat = os.stat(file_path)
+            record = self.files.get(key)
+            if record and record['mtime_ns'] == stat.st_mtime_ns and record['size'] == stat.st_size:
+                hashes[file_path] = record['hash']
+                continue
+            content_hash = hash_file(file_path)
+            self.files[key] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'hash': content_hash}
+            self.dirty = True
+            hashes[file_path] = content_hash
+        return hashes
+
+    def has(self, content_hash):
+        return os.path.exists(self._entry_path(content_hash))
+
+    # Return the cached payload for a content hash, or None if it is not (or no longer) cached
+    def get(self, content_hash):
+        try:
+            with open(self._entry_path(content_hash), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, content_hash, payload):
+        os.makedirs(self.entries_directory, exist_ok=True)
+        entry_path = self._entry_path(content_hash)
+        temp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(payload, file, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, entry_path)
+
+    # A build key identifies the exact inputs an output was produced from
+    def build_key(self, file_hashes, *settings):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.variant.encode('utf-8'))
+        for setting in settings:
+            digest.update(repr(setting).encode('utf-8'))
+        for file_path, content_hash in file_hashes.items():
+            digest.update(os.path.abspath(file_path).encode('utf-8'))
+            digest.update(content_hash.encode('ascii'))
+        return digest.hexdigest()
+
+    # True if output_path was last written from the same build key and has not been
+    # touched since, and every file recorded as part of it is still in place
+    def output_is_current(self, output_path, build_key):
+        record = self.outputs.get(os.path.abspath(output_path))
+        if not record or record['build_key'] != build_key:
+            return False
+        try:
+            stat = os.stat(output_path)
+            if record['mtime_ns'] != stat.st_mtime_ns or record['size'] != stat.st_size:
+                return False
+            return all(os.stat(path).st_size == size for path, size in record.get('parts', {}).items())
+        except OSError:
+            return False
+
+    # parts: further files the output consists of (such as the shards of a sharded
+    # page). Only their sizes are recorded; they are checked along with the output.
+    def record_output(self, output_path, build_key, parts=()):
+        stat = os.stat(output_path)
+        self.outputs[os.path.abspath(output_path)] = {
+            'build_key': build_key, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+            'parts': {os.path.abspath(path): os.path.getsize(path) for path in parts}
+        }
+        self.dirty = True
+
+    # Write the index back (atomically) and drop entries no index refers to any more.
+    # An entry removed while another build still wants it only costs that build a re-parse.
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(self.cache_directory, exist_ok=True)
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': CACHE_FORMAT_VERSION, 'files': self.files, 'outputs': self.outputs}, file)
+        os.replace(temp_path, self.index_path)
+        self.dirty = False
+
+        live_hashes = {record['hash'] for record in self.files.values()}
+        for index_file in os.listdir(self.cache_directory):
+            index_path = os.path.join(self.cache_directory, index_file)
+            if index_file.endswith('.json') and index_path != self.index_path:
+                try:
+                    with open(index_path, 'r', encoding='utf-8') as file:
+                        live_hashes.update(record['hash'] for record in json.load(file).get('files', {}).values())
+                except (OSError, ValueError, KeyError, AttributeError):
+                    continue
+        if os.path.isdir(self.entries_directory):
+            for entry in os.listdir(self.entries_directory):
+                if entry.endswith('.json') and entry[:-5].rsplit('-', 1)[-1] not in live_hashes:
+                    try:
+                        os.remove(os.path.join(self.entries_directory, entry))
+                    except OSError:
+                        pass
@@ -0,0 +1,130 @@
+import hashlib
+import json
+from operator import itemgetter
+
+# Optional fast JSON backends. Everything falls back to the stdlib json module when
+# they are not installed (pip install orjson msgspec).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# --- Configuration ---
+# 'auto' uses msgspec for schema-validated decoding and orjson for encoding/decoding
+# when they are installed; 'json' forces the stdlib module everywhere.
+json_backend = 'auto'
+# --- End Configuration ---
+
+by_verse = itemgetter("verse")
+by_chapter = itemgetter("chapter")
+
+if msgspec is not None:
+    # Declared schema of a book file. The decoder validates types while parsing, so
+    # no per-verse checks are needed afterwards. Numbers may be given as strings, as
+    # in the aruljohn/Bible-kjv files; those are converted with int() afterwards, so
+    # exactly the strings the checked converter accepts get through. Unknown keys
+    # are ignored.
+    class Verse(msgspec.Struct):
+        verse: int | str
+        text: str
+
+    class Chapter(msgspec.Struct):
+        chapter: int | str
+        verses: list[Verse]
+
+    class Book(msgspec.Struct):
+        book: str
+        chapters: list[Chapter]
+
+    BOOK_FILE_DECODER = msgspec.json.Decoder(Book | list[Book])
+
+def use_orjson():
+    return orjson is not None and json_backend == 'auto'
+
+def use_msgspec():
+    return msgspec is not None and json_backend == 'auto'
+
+# Identifies what decoding and serializing produce: this module's source and the
+# active backends with their versions. Part of the build cache variants, so cached
+# payloads are not reused across codec changes.
+def codec_fingerprint():
+    digest = hashlib.blake2b(digest_size=8)
+    with open(__file__, 'rb') as file:
+        digest.update(file.read())
+    digest.update(repr((json_backend, use_orjson() and orjson.__version__,
+                        use_msgspec() and msgspec.__version__)).encode('utf-8'))
+    return digest.hexdigest()
+
+# Parse JSON from bytes. Both backends raise json.JSONDecodeError (orjson's error is
+# a subclass) on malformed input.
+def loads(data):
+    if use_orjson():
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Minified JSON, identical to json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+def dumps_compact(obj):
+    if use_orjson():
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+# Pretty-printed JSON, identical to json.dumps(obj, ensure_ascii=False, indent=4).
+# orjson only indents by two spaces; JSON strings never contain a raw newline, so
+# doubling the leading spaces of every line gives exactly the four-space layout.
+def dumps_indented(obj):
+    if use_orjson():
+        lines = orjson.dumps(obj, option=orjson.OPT_INDENT_2).split(b'\n')
+        return b'\n'.join([line[:len(line) - len(line.lstrip(b' '))] + line for line in lines]).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, indent=4)
+
+# Decode and convert a book file through the declared schema. Returns
+# [(book_name, {"chapters": [...]}), ...] with chapters and verses sorted, or None
+# when msgspec is unavailable or the file does not match the schema, in which case
+# the caller should fall back to the lenient per-verse conversion (which salvages
+# what it can and reports what it skips).
+def decode_books(data):
+    if not use_msgspec():
+        return None
+    try:
+        decoded = BOOK_FILE_DECODER.decode(data)
+    except (msgspec.ValidationError, msgspec.DecodeError):
+        return None
+    books = []
+    for book in decoded if isinstance(decoded, list) else [decoded]:
+        if not book.chapters:
+            return None
+        try:
+            chapters = [
+                {"chapter": int(chapter.chapter),
+                 "verses": sorted([{"verse": int(verse.verse), "text": verse.text} for verse in chapter.verses],
+                                  key=by_verse)}
+                for chapter in book.chapters
+            ]
+        except ValueError:
+            return None
+        chapters.sort(key=by_chapter)
+        books.append((book.book, {"chapters": chapters}))
+    return books
+
+# Convert one decoded book dict assuming it is well formed: no per-verse type
+# checks, just the conversion. Returns None on any malformed data so the caller
+# can rerun the checked conversion, which reports exactly what is wrong.
+def convert_book_unchecked(book_data):
+    try:
+        chapters = [
+            {"chapter": int(chapter["chapter"]),
+             "verses": sorted([{"verse": int(verse["verse"]), "text": verse["text"]} for verse in chapter["verses"]],
+                              key=by_verse)}
+            for chapter in book_data["chapters"]
+        ]
+        book_name = book_data["book"]
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    if not chapters or not isinstance(book_data["chapters"], list):
+        return None
+    chapters.sort(key=by_chapter)
+    return book_name, {"chapters": chapters}
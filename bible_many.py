@@ -1,110 +1,194 @@
-import json
-import os
-
-# Define input directory and output file paths
-input_json_directory = 'Bible' # use https://github.com/aruljohn/Bible-kjv
-output_html_file = 'bible.html' # push the entire bible to a <script> in HTML
-
-# Function to convert JSON structure (assumed to be a dictionary for a single book)
-# to desired JavaScript format
-def convert_book_json_to_js(book_data):
-    # Check if the input is actually a dictionary with the expected 'book' key
-    if not isinstance(book_data, dict) or 'book' not in book_data:
-        # Log an error or warning if the structure is unexpected
-        print(f"Warning: Skipping item with unexpected format: {type(book_data)}")
-        return None # Return None to indicate failure
-
-    book_name = book_data['book']
-    chapters = []
-    # Check if 'chapters' key exists and is a list
-    if 'chapters' in book_data and isinstance(book_data['chapters'], list):
-        for chapter in book_data['chapters']:
-            # Basic check for chapter structure
-            if isinstance(chapter, dict) and 'chapter' in chapter and 'verses' in chapter and isinstance(chapter['verses'], list):
-                try:
-                    chapter_obj = {
-                        "chapter": int(chapter["chapter"]),
-                        "verses": [
-                            {
-                                "verse": int(verse["verse"]),
-                                "text": verse["text"]
-                            }
-                            # Check verse structure before processing
-                            for verse in chapter["verses"] if isinstance(verse, dict) and 'verse' in verse and 'text' in verse
-                        ]
-                    }
-                    chapters.append(chapter_obj)
-                except (ValueError, KeyError, TypeError) as e:
-                     print(f"Warning: Skipping chapter/verse due to invalid data in book '{book_name}': {e}")
-            else:
-                print(f"Warning: Skipping chapter with unexpected format in book '{book_name}': {chapter}")
-    else:
-         print(f"Warning: 'chapters' key missing or not a list in book '{book_name}'")
-
-
-    # Only return data if chapters were successfully processed
-    if chapters:
-        return {book_name: {"chapters": chapters}}
-    else:
-        print(f"Warning: No valid chapters found for book '{book_name}'. Skipping this book.")
-        return None
-
-
-# Consolidate all JSON data
-consolidated_data = {}
-# Check if the directory exists
-if not os.path.isdir(input_json_directory):
-    print(f"Error: Input directory not found at '{input_json_directory}'")
-else:
-    for json_file in os.listdir(input_json_directory):
-        if json_file.endswith('.json'):
-            file_path = os.path.join(input_json_directory, json_file)
-            print(f"Processing file: {file_path}") # Added for debugging
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    input_data = json.load(file)
-
-                    # Check if input_data is a list or a dictionary
-                    if isinstance(input_data, list):
-                        # If it's a list, process each item assuming it's a book dictionary
-                        print(f"  File contains a list. Processing {len(input_data)} items.") # Debugging
-                        for book_item in input_data:
-                            js_data = convert_book_json_to_js(book_item)
-                            if js_data: # Only update if conversion was successful
-                                consolidated_data.update(js_data)
-                    elif isinstance(input_data, dict):
-                        # If it's a dictionary, process it directly
-                        print("  File contains a dictionary. Processing directly.") # Debugging
-                        js_data = convert_book_json_to_js(input_data)
-                        if js_data: # Only update if conversion was successful
-                            consolidated_data.update(js_data)
-                    else:
-                        # Handle cases where the root JSON element is neither list nor dict
-                         print(f"Warning: Skipping file {json_file} - root element is not a list or dictionary.")
-
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON from file {file_path}: {e}")
-            except Exception as e:
-                print(f"Error processing file {file_path}: {e}")
-
-# Write consolidated data to HTML file with JavaScript
-if consolidated_data:
-    try:
-        with open(output_html_file, 'w', encoding='utf-8') as file:
-            file.write("<html><head><title>Bible Data</title></head><body>\n")
-            file.write("<script>\n")
-            file.write("// --- !!! SIMULATED BIBLE DATA !!! ---\n")
-            file.write("const simulatedBibleData = ")
-            file.write(json.dumps(consolidated_data, ensure_ascii=False, indent=4))
-            file.write(";\n")
-            file.write("// --- End Simulated Data ---\n")
-            file.write("</script>\n")
-            file.write("</body></html>")
-
-        print(f"Conversion complete. HTML file saved as '{output_html_file}'.")
-    except IOError as e:
-        print(f"Error writing HTML file '{output_html_file}': {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred while writing the HTML file: {e}")
-else:
-     print(f"No valid JSON data successfully processed from '{input_json_directory}'. Output file '{output_html_file}' not created or updated.")
+import json
+import os
+
+from bible_build_cache import BookBuildCache, source_fingerprint
+from bible_codec import codec_fingerprint, dumps_indented, loads
+from bible_metrics import BuildMetrics, ConsoleMetrics, run_profiled
+
+# Define input directory and output file paths
+input_json_directory = 'Bible' # use https://github.com/aruljohn/Bible-kjv
+output_html_file = 'bible.html' # push the entire bible to a <script> in HTML
+# Incremental build cache: unchanged files are not re-parsed and a rebuild with no
+# changed inputs is skipped entirely. Set to None to always rebuild.
+build_cache_directory = '.bible_build_cache'
+# Instrumentation (see bible_metrics.py): time each stage, count verses and bytes and
+# collect warnings instead of printing them, then save a JSON report. With a profile
+# file the build also runs under cProfile and the stats are saved there.
+metrics_report_file = None # e.g. 'bible_many_metrics.json'
+profile_file = None # e.g. 'bible_many.prof'
+
+# Function to convert JSON structure (assumed to be a dictionary for a single book)
+# to desired JavaScript format. Warnings go through warn (print by default).
+def convert_book_json_to_js(book_data, warn=print):
+    # Check if the input is actually a dictionary with the expected 'book' key
+    if not isinstance(book_data, dict) or 'book' not in book_data:
+        # Log an error or warning if the structure is unexpected
+        warn(f"Warning: Skipping item with unexpected format: {type(book_data)}")
+        return None # Return None to indicate failure
+
+    book_name = book_data['book']
+    chapters = []
+    # Check if 'chapters' key exists and is a list
+    if 'chapters' in book_data and isinstance(book_data['chapters'], list):
+        for chapter in book_data['chapters']:
+            # Basic check for chapter structure
+            if isinstance(chapter, dict) and 'chapter' in chapter and 'verses' in chapter and isinstance(chapter['verses'], list):
+                try:
+                    chapter_obj = {
+                        "chapter": int(chapter["chapter"]),
+                        "verses": [
+                            {
+                                "verse": int(verse["verse"]),
+                                "text": verse["text"]
+                            }
+                            # Check verse structure before processing
+                            for verse in chapter["verses"] if isinstance(verse, dict) and 'verse' in verse and 'text' in verse
+                        ]
+                    }
+                    chapters.append(chapter_obj)
+                except (ValueError, KeyError, TypeError) as e:
+                     warn(f"Warning: Skipping chapter/verse due to invalid data in book '{book_name}': {e}")
+            else:
+                warn(f"Warning: Skipping chapter with unexpected format in book '{book_name}': {chapter}")
+    else:
+         warn(f"Warning: 'chapters' key missing or not a list in book '{book_name}'")
+
+
+    # Only return data if chapters were successfully processed
+    if chapters:
+        return {book_name: {"chapters": chapters}}
+    else:
+        warn(f"Warning: No valid chapters found for book '{book_name}'. Skipping this book.")
+        return None
+
+
+# Consolidate every book file in input_json_directory into output_html_file. Returns
+# the number of books written, 0 if nothing could be written, or None if the output
+# was already up to date (or the input directory is missing). Pass a BuildMetrics as
+# metrics to instrument the build; by default messages are printed as they come.
+def build_many(input_json_directory, output_html_file, build_cache_directory='.bible_build_cache', metrics=None):
+    metrics = metrics or ConsoleMetrics()
+    # Consolidate all JSON data
+    consolidated_data = {}
+    cache = None
+    output_is_current = False
+    books_written = 0
+    # Check if the directory exists
+    if not os.path.isdir(input_json_directory):
+        metrics.warn(f"Error: Input directory not found at '{input_json_directory}'")
+    else:
+        with metrics.stage('scan'):
+            json_files = [json_file for json_file in os.listdir(input_json_directory) if json_file.endswith('.json')]
+            file_paths = [os.path.join(input_json_directory, json_file) for json_file in json_files]
+            metrics.count('files', len(file_paths))
+
+            if build_cache_directory:
+                cache = BookBuildCache(build_cache_directory, 'many-' + source_fingerprint(__file__) + '-' + codec_fingerprint())
+                file_hashes = cache.fingerprint_files(file_paths)
+                build_key = cache.build_key(file_hashes)
+                output_is_current = cache.output_is_current(output_html_file, build_key)
+
+        if output_is_current:
+            print(f"No input changes since the last build. '{output_html_file}' is up to date.")
+        else:
+            for json_file, file_path in zip(json_files, file_paths):
+                # Reuse the converted books of files that have not changed since the last build
+                with metrics.stage('cache'):
+                    cached_books = cache.get(file_hashes[file_path]) if cache is not None else None
+                if cached_books is not None:
+                    metrics.count('files_cached')
+                    consolidated_data.update(cached_books)
+                    continue
+
+                metrics.info(f"Processing file: {file_path}") # Added for debugging
+                try:
+                    with open(file_path, 'rb') as file:
+                        with metrics.stage('read'):
+                            raw_data = file.read()
+                        metrics.count('input_bytes', len(raw_data))
+                        with metrics.stage('decode'):
+                            input_data = loads(raw_data)
+
+                        file_books = []
+                        # Check if input_data is a list or a dictionary
+                        with metrics.stage('convert'):
+                            if isinstance(input_data, list):
+                                # If it's a list, process each item assuming it's a book dictionary
+                                metrics.info(f"  File contains a list. Processing {len(input_data)} items.") # Debugging
+                                for book_item in input_data:
+                                    js_data = convert_book_json_to_js(book_item, metrics.warn)
+                                    if js_data: # Only update if conversion was successful
+                                        file_books.extend(js_data.items())
+                            elif isinstance(input_data, dict):
+                                # If it's a dictionary, process it directly
+                                metrics.info("  File contains a dictionary. Processing directly.") # Debugging
+                                js_data = convert_book_json_to_js(input_data, metrics.warn)
+                                if js_data: # Only update if conversion was successful
+                                    file_books.extend(js_data.items())
+                            else:
+                                # Handle cases where the root JSON element is neither list nor dict
+                                 metrics.warn(f"Warning: Skipping file {json_file} - root element is not a list or dictionary.")
+
+                        consolidated_data.update(file_books)
+                        if cache is not None:
+                            with metrics.stage('cache'):
+                                cache.put(file_hashes[file_path], file_books)
+
+                except json.JSONDecodeError as e:
+                    metrics.warn(f"Error decoding JSON from file {file_path}: {e}")
+                except Exception as e:
+                    metrics.warn(f"Error processing file {file_path}: {e}")
+
+    # Write consolidated data to HTML file with JavaScript
+    if consolidated_data:
+        if metrics.collecting:
+            metrics.count('books', len(consolidated_data))
+            metrics.count('verses', sum(len(chapter["verses"]) for book in consolidated_data.values()
+                                        for chapter in book["chapters"]))
+        try:
+            with metrics.stage('serialize'):
+                serialized_data = dumps_indented(consolidated_data)
+            with metrics.stage('write'):
+                with open(output_html_file, 'w', encoding='utf-8') as file:
+                    file.write("<html><head><title>Bible Data</title></head><body>\n")
+                    file.write("<script>\n")
+                    file.write("// --- !!! SIMULATED BIBLE DATA !!! ---\n")
+                    file.write("const simulatedBibleData = ")
+                    file.write(serialized_data)
+                    file.write(";\n")
+                    file.write("// --- End Simulated Data ---\n")
+                    file.write("</script>\n")
+                    file.write("</body></html>")
+            books_written = len(consolidated_data)
+            metrics.count('output_bytes', os.path.getsize(output_html_file))
+
+            print(f"Conversion complete. HTML file saved as '{output_html_file}'.")
+            if cache is not None:
+                cache.record_output(output_html_file, build_key)
+        except IOError as e:
+            metrics.warn(f"Error writing HTML file '{output_html_file}': {e}")
+        except Exception as e:
+            metrics.warn(f"An unexpected error occurred while writing the HTML file: {e}")
+    elif not output_is_current:
+         print(f"No valid JSON data successfully processed from '{input_json_directory}'. Output file '{output_html_file}' not created or updated.")
+
+    if cache is not None:
+        with metrics.stage('cache'):
+            cache.save()
+
+    if output_is_current or not os.path.isdir(input_json_directory):
+        return None
+    return books_written
+
+if __name__ == '__main__':
+    metrics = BuildMetrics() if metrics_report_file or profile_file else None
+    if profile_file:
+        run_profiled(profile_file, build_many, input_json_directory, output_html_file, build_cache_directory, metrics)
+        print(f"Profile saved as '{profile_file}'.")
+    else:
+        build_many(input_json_directory, output_html_file, build_cache_directory, metrics)
+    if metrics is not None:
+        print(metrics.summary())
+        if metrics_report_file:
+            metrics.write_report(metrics_report_file)
+            print(f"Metrics report saved as '{metrics_report_file}'.")
@@ -0,0 +1,149 @@
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Instrumentation for the Bible build scripts.
+#
+# The build functions take a metrics object and report through it: stage() times a
+# block, timed() times the pulls from a generator stage, count() adds to a counter
+# and info()/warn() carry the progress and warning messages. ConsoleMetrics is the
+# default and keeps the scripts' usual behaviour (every message printed, nothing
+# measured). BuildMetrics measures instead: it aggregates the warnings rather than
+# printing each one and produces a JSON report.
+#
+# Stage times are exclusive: while a nested stage runs, the enclosing one is paused,
+# so pipelined generator stages (ingest -> reorder -> write) are each charged only
+# for their own work. Work done inside the ingest worker processes is measured there
+# and reported separately under 'worker_stages', summed over all files.
+
+# Distinct warning messages kept in a report; further ones are only counted
+MAX_DISTINCT_WARNINGS = 1000
+
+class ConsoleMetrics:
+    collecting = False
+
+    def stage(self, name):
+        return nullcontext()
+
+    def timed(self, iterable, name):
+        return iterable
+
+    def count(self, name, amount=1):
+        pass
+
+    def info(self, message):
+        print(message)
+
+    def warn(self, message):
+        print(message)
+
+    def merge_worker(self, snapshot):
+        pass
+
+class BuildMetrics(ConsoleMetrics):
+    collecting = True
+
+    def __init__(self):
+        self.stages = Counter()
+        self.worker_stages = Counter()
+        self.counters = Counter()
+        self.warnings = Counter()
+        self.warning_count = 0
+        self._stack = []
+        self._slice_start = None
+        self.created = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            self.stages[self._stack[-1]] += now - self._slice_start
+        self._stack.append(name)
+        self._slice_start = now
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.stages[self._stack.pop()] += now - self._slice_start
+            self._slice_start = now # The enclosing stage resumes
+
+    # Yield from iterable, charging the time spent producing each item to the stage
+    def timed(self, iterable, name):
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def info(self, message):
+        pass # Progress chatter is what the metrics replace
+
+    def warn(self, message):
+        self.warning_count += 1
+        message = message.strip()
+        if message in self.warnings or len(self.warnings) < MAX_DISTINCT_WARNINGS:
+            self.warnings[message] += 1
+
+    # State to send back from a worker process (plain data, so it pickles cheaply)
+    def snapshot(self):
+        return {'stages': dict(self.stages), 'counters': dict(self.counters),
+                'warnings': dict(self.warnings), 'warning_count': self.warning_count}
+
+    def merge_worker(self, snapshot):
+        if not snapshot:
+            return
+        self.worker_stages.update(snapshot['stages'])
+        self.counters.update(snapshot['counters'])
+        for message, count in snapshot['warnings'].items():
+            if message in self.warnings or len(self.warnings) < MAX_DISTINCT_WARNINGS:
+                self.warnings[message] += count
+        self.warning_count += snapshot['warning_count']
+
+    def report(self):
+        return {
+            'wall_seconds': time.perf_counter() - self.created,
+            'stages': dict(self.stages),
+            'worker_stages': dict(self.worker_stages),
+            'counters': dict(self.counters),
+            'warning_count': self.warning_count,
+            'warnings': [{'message': message, 'count': count} for message, count in self.warnings.most_common()],
+        }
+
+    def write_report(self, path):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=4)
+        os.replace(temp_path, path)
+
+    # A few lines for the console in place of the individual messages
+    def summary(self):
+        lines = ["Stage times (s): " + ', '.join(f"{name} {seconds:.3f}" for name, seconds in self.stages.items())]
+        if self.worker_stages:
+            lines.append("Per-file work (s, summed over files): "
+                         + ', '.join(f"{name} {seconds:.3f}" for name, seconds in self.worker_stages.items()))
+        if self.counters:
+            lines.append("Counts: " + ', '.join(f"{name} {value}" for name, value in sorted(self.counters.items())))
+        if self.warning_count:
+            lines.append(f"{self.warning_count} warnings ({len(self.warnings)} distinct); most frequent:")
+            lines.extend(f"  {count} x {message}" for message, count in self.warnings.most_common(5))
+        return '\n'.join(lines)
+
+# Run function(*args, **kwargs) under cProfile and write the stats to profile_path
+# (load them with pstats, snakeviz, or flameprof/gprof2dot for a flame graph).
+# Only this process is profiled; build with one ingest worker to include the
+# per-file work.
+def run_profiled(profile_path, function, *args, **kwargs):
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(profile_path)
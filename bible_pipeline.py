@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+
+from bible_metrics import BuildMetrics, ConsoleMetrics
+from bible_reorder import (convert_book_bytes, convert_book_items, export_books, kjv_file_sort_key, order_books_kjv,
+                           serialize_book, write_inline_html, write_inline_html_to, write_sharded_html)
+
+# In-process library interface to the Bible build, for callers (such as a
+# long-running service) that cannot shell out to bible_reorder.py per build.
+#
+# A build runs loader -> converter -> orderer -> writer:
+#   DirectoryLoader / MemoryLoader   yield BookSource entries (files or in-memory documents)
+#   BookConverter                    decodes and converts one source into books
+#   KJVOrderer                       puts the books in KJV order
+#   InlineHtmlWriter / ShardedHtmlWriter  serialize and write the page (path or file object)
+# BiblePipeline ties them together. With warm=True it keeps the converted books
+# (and their serialized fragments) resident between builds, so a repeated build
+# only re-parses sources that changed.
+#
+# The page is the same as bible_reorder.py writes. Conversion runs in the calling
+# process; use bible_reorder.build_bible for the multi-process, disk-cached build.
+
+# name: shown in messages. version: identifies the content, e.g. the file's
+# (mtime, size) or a hash of the bytes; None means it is never kept resident.
+# read: returns the raw bytes, or already-parsed book data (a dict or list).
+BookSource = namedtuple('BookSource', 'name version read')
+
+def read_file_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+# The *.json book files of a directory, in KJV order of their names. A file's
+# version is its mtime and size, so unchanged files are recognised without reading them.
+class DirectoryLoader:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def sources(self):
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"Input directory not found at '{self.directory}'")
+        json_files = sorted((f for f in os.listdir(self.directory) if f.endswith('.json')), key=kjv_file_sort_key)
+        for json_file in json_files:
+            path = os.path.join(self.directory, json_file)
+            stat = os.stat(path)
+            yield BookSource(path, (stat.st_mtime_ns, stat.st_size), lambda path=path: read_file_bytes(path))
+
+# In-memory documents: a mapping (or iterable of pairs) of name -> JSON text (str or
+# bytes) or already-parsed book data. Text is versioned by a hash of its bytes;
+# parsed data has no cheap version and is converted on every build.
+class MemoryLoader:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sources(self):
+        items = self.documents.items() if hasattr(self.documents, 'items') else self.documents
+        for name, document in items:
+            if isinstance(document, str):
+                document = document.encode('utf-8')
+            version = hashlib.blake2b(document, digest_size=16).digest() if isinstance(document, bytes) else None
+            yield BookSource(name, version, lambda document=document: document)
+
+# Decode and convert one source into [(book_name, {"chapters": [...]}), ...], with
+# the same validation and messages as bible_reorder.py. Returns None if the source
+# could not be read or decoded.
+class BookConverter:
+    def convert(self, source, metrics):
+        metrics.info(f"Processing file: {source.name}") # Added for debugging
+        try:
+            with metrics.stage('read'):
+                data = source.read()
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                return convert_book_bytes(bytes(data), source.name, metrics)
+            return convert_book_items(data, source.name, metrics)
+        except json.JSONDecodeError as e:
+            metrics.warn(f"Error decoding JSON from file {source.name}: {e}")
+        except Exception as e:
+            metrics.warn(f"Error processing file {source.name}: {e}")
+        return None
+
+class KJVOrderer:
+    # Takes an iterable of per-source lists of (book_name, fragment, book_value)
+    def order(self, file_results, metrics):
+        return order_books_kjv(file_results, metrics)
+
+# The single-page layout. output is a path (written atomically) or an open text file.
+class InlineHtmlWriter:
+    output_mode = 'inline'
+
+    def __init__(self, output, extra_script=''):
+        self.output = output
+        self.extra_script = extra_script
+
+    def write(self, ordered_books):
+        if isinstance(self.output, (str, os.PathLike)):
+            return write_inline_html(ordered_books, self.output, self.extra_script)
+        return write_inline_html_to(ordered_books, self.output, self.extra_script)
+
+# The sharded layouts ('book_shards' or 'chapter_shards'). The shards are files
+# next to the page, so output must be a path.
+class ShardedHtmlWriter:
+    def __init__(self, output_path, shard_directory='bible_data', output_mode='book_shards', extra_script=''):
+        if output_mode not in ('book_shards', 'chapter_shards'):
+            raise ValueError(f"Unknown output mode '{output_mode}'")
+        self.output_path = output_path
+        self.shard_directory = shard_directory
+        self.output_mode = output_mode
+        self.extra_script = extra_script
+
+    def write(self, ordered_books):
+        return write_sharded_html(ordered_books, self.output_path, self.shard_directory, self.extra_script)
+
+class BiblePipeline:
+    def __init__(self, converter=None, orderer=None, warm=False, metrics=None):
+        self.converter = converter or BookConverter()
+        self.orderer = orderer or KJVOrderer()
+        self.warm = warm
+        self.metrics = metrics
+        # source name -> (version, [[book_name, book_value, {output_mode: fragment}], ...])
+        self.resident = {}
+
+    # Drop every resident book, e.g. to free memory between bursts of builds
+    def clear(self):
+        self.resident.clear()
+
+    def _file_results(self, loader, output_mode, metrics):
+        for source in loader.sources():
+            entry = None
+            if self.warm and source.version is not None:
+                resident = self.resident.get(source.name)
+                if resident is not None and resident[0] == source.version:
+                    entry = resident[1]
+                    metrics.count('sources_resident')
+            if entry is None:
+                converted = self.converter.convert(source, metrics)
+                if converted is None:
+                    yield []
+                    continue
+                metrics.count('sources_converted')
+                entry = [[book_name, book_value, {}] for book_name, book_value in converted]
+                if self.warm and source.version is not None:
+                    # Replaces the previous version of the source, if any
+                    self.resident[source.name] = (source.version, entry)
+
+            books = []
+            for book_name, book_value, fragments in entry:
+                fragment = fragments.get(output_mode)
+                if fragment is None:
+                    with metrics.stage('serialize'):
+                        fragment = serialize_book(book_name, book_value, output_mode)
+                    if self.warm:
+                        fragments[output_mode] = fragment
+                books.append((book_name, fragment, book_value))
+            yield books
+
+    # Build one page from loader's sources with writer. exporters (such as
+    # VerseStoreWriter or SearchIndexBuilder) receive every ordered book and are
+    # closed after a successful write. Returns the number of books written.
+    def build(self, loader, writer, exporters=(), metrics=None):
+        metrics = metrics or self.metrics or ConsoleMetrics()
+        file_results = metrics.timed(self._file_results(loader, writer.output_mode, metrics), 'ingest')
+        ordered_books = metrics.timed(self.orderer.order(file_results, metrics), 'reorder')
+        if exporters:
+            ordered_books = metrics.timed(export_books(ordered_books, exporters), 'export')
+        with metrics.stage('write'):
+            books_written = writer.write(ordered_books)
+        if books_written:
+            metrics.count('books_written', books_written)
+            with metrics.stage('export'):
+                for exporter in exporters:
+                    exporter.close()
+        return books_written
+
+# Command-line wrapper: python bible_pipeline.py Bible bible.html [--output-mode ...]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a directory of Bible book JSON files into an HTML page "
+                                                 "with the books in KJV order.")
+    parser.add_argument('input_directory', help="directory of book JSON files")
+    parser.add_argument('output', help="HTML file to write, or - for standard output (inline mode only)")
+    parser.add_argument('--output-mode', choices=('inline', 'book_shards', 'chapter_shards'), default='inline')
+    parser.add_argument('--shard-directory', default='bible_data',
+                        help="directory for the shards, relative to the HTML file (each page uses its own subdirectory)")
+    parser.add_argument('--metrics-report', help="write a JSON metrics report here and collect warnings")
+    args = parser.parse_args(argv)
+
+    if args.output_mode == 'inline':
+        writer = InlineHtmlWriter(sys.stdout if args.output == '-' else args.output)
+    elif args.output == '-':
+        parser.error("sharded output modes need an output file")
+    else:
+        writer = ShardedHtmlWriter(args.output, args.shard_directory, args.output_mode)
+    metrics = BuildMetrics() if args.metrics_report else None
+    # Progress messages would end up inside the page when writing to standard output
+    if metrics is None and args.output == '-':
+        metrics = BuildMetrics()
+
+    try:
+        books_written = BiblePipeline(metrics=metrics).build(DirectoryLoader(args.input_directory), writer)
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    log = sys.stderr if args.output == '-' else sys.stdout
+    if args.metrics_report:
+        print(metrics.summary(), file=log)
+        metrics.write_report(args.metrics_report)
+    elif metrics is not None and metrics.warning_count:
+        print(metrics.summary(), file=log)
+    if not books_written:
+        print(f"No valid JSON data found or processed according to KJV order from '{args.input_directory}'.", file=log)
+        return 1
+    print(f"Wrote {books_written} books to {'standard output' if args.output == '-' else repr(args.output)}.", file=log)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,169 +1,625 @@
-import json
-import os
-from collections import OrderedDict  # Import OrderedDict for explicit ordering
-
-# Define input directory and output file paths
-input_json_directory = 'Bible'
-output_html_file = 'bible.html'
-
-# --- KJV Book Order ---
-# Define the canonical order of books in the KJV Bible
-KJV_BOOK_ORDER = [
-    # Old Testament
-    "Genesis", "Exodus", "Leviticus", "Numbers", "Deuteronomy", "Joshua", "Judges", "Ruth",
-    "1 Samuel", "2 Samuel", "1 Kings", "2 Kings", "1 Chronicles", "2 Chronicles", "Ezra",
-    "Nehemiah", "Esther", "Job", "Psalms", "Proverbs", "Ecclesiastes", "Song of Solomon",
-    "Isaiah", "Jeremiah", "Lamentations", "Ezekiel", "Daniel", "Hosea", "Joel", "Amos",
-    "Obadiah", "Jonah", "Micah", "Nahum", "Habakkuk", "Zephaniah", "Haggai", "Zechariah", "Malachi",
-    # New Testament
-    "Matthew", "Mark", "Luke", "John", "Acts", "Romans", "1 Corinthians", "2 Corinthians",
-    "Galatians", "Ephesians", "Philippians", "Colossians", "1 Thessalonians", "2 Thessalonians",
-    "1 Timothy", "2 Timothy", "Titus", "Philemon", "Hebrews", "James", "1 Peter", "2 Peter",
-    "1 John", "2 John", "3 John", "Jude", "Revelation"
-]
-# Create a set for quick lookups of expected books
-KJV_BOOKS_SET = set(KJV_BOOK_ORDER)
-
-# Function to convert JSON structure (assumed to be a dictionary for a single book)
-# to desired JavaScript format
-def convert_book_json_to_js(book_data):
-    # Check if the input is actually a dictionary with the expected 'book' key
-    if not isinstance(book_data, dict) or 'book' not in book_data:
-        # Log an error or warning if the structure is unexpected
-        print(f"Warning: Skipping item with unexpected format: {type(book_data)}")
-        return None # Return None to indicate failure
-
-    book_name = book_data['book']
-    chapters = []
-    # Check if 'chapters' key exists and is a list
-    if 'chapters' in book_data and isinstance(book_data['chapters'], list):
-        for chapter in book_data['chapters']:
-            # Basic check for chapter structure
-            if isinstance(chapter, dict) and 'chapter' in chapter and 'verses' in chapter and isinstance(chapter['verses'], list):
-                try:
-                    # Sort verses numerically before creating chapter object
-                    sorted_verses = sorted(chapter["verses"], key=lambda v: int(v.get("verse", 0)))
-
-                    chapter_obj = {
-                        "chapter": int(chapter["chapter"]),
-                        "verses": [
-                            {
-                                "verse": int(verse["verse"]),
-                                "text": verse["text"]
-                            }
-                            # Check verse structure before processing
-                            for verse in sorted_verses if isinstance(verse, dict) and 'verse' in verse and 'text' in verse
-                        ]
-                    }
-                    chapters.append(chapter_obj)
-                except (ValueError, KeyError, TypeError) as e:
-                     print(f"Warning: Skipping chapter/verse due to invalid data in book '{book_name}', chapter '{chapter.get('chapter', 'N/A')}': {e}")
-            else:
-                print(f"Warning: Skipping chapter with unexpected format in book '{book_name}': {chapter}")
-    else:
-         print(f"Warning: 'chapters' key missing or not a list in book '{book_name}'")
-
-    # Sort chapters numerically before returning book data
-    if chapters:
-        chapters.sort(key=lambda c: c.get("chapter", 0))
-        return {book_name: {"chapters": chapters}}
-    else:
-        print(f"Warning: No valid chapters found for book '{book_name}'. Skipping this book.")
-        return None
-
-# --- Main Processing Logic ---
-
-# Consolidate all JSON data
-consolidated_data = {}
-# Check if the directory exists
-if not os.path.isdir(input_json_directory):
-    print(f"Error: Input directory not found at '{input_json_directory}'")
-else:
-    for json_file in os.listdir(input_json_directory):
-        if json_file.endswith('.json'):
-            file_path = os.path.join(input_json_directory, json_file)
-            print(f"Processing file: {file_path}") # Added for debugging
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    input_data = json.load(file)
-
-                    books_in_file = []
-                    # Check if input_data is a list or a dictionary
-                    if isinstance(input_data, list):
-                        # If it's a list, process each item assuming it's a book dictionary
-                        print(f"  File contains a list. Processing {len(input_data)} items.") # Debugging
-                        books_in_file = input_data
-                    elif isinstance(input_data, dict):
-                        # If it's a dictionary, treat it as a single book item
-                        print("  File contains a dictionary. Processing directly.") # Debugging
-                        books_in_file = [input_data]
-                    else:
-                        # Handle cases where the root JSON element is neither list nor dict
-                         print(f"Warning: Skipping file {json_file} - root element is not a list or dictionary.")
-                         continue # Skip to the next file
-
-                    # Process each book found in the file
-                    for book_item in books_in_file:
-                         js_data = convert_book_json_to_js(book_item)
-                         if js_data: # Only update if conversion was successful
-                             # Check for duplicate book entries (optional but good practice)
-                             book_name = list(js_data.keys())[0]
-                             if book_name in consolidated_data:
-                                 print(f"Warning: Duplicate data found for book '{book_name}' from file {json_file}. Overwriting previous data.")
-                             consolidated_data.update(js_data)
-
-
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON from file {file_path}: {e}")
-            except Exception as e:
-                print(f"Error processing file {file_path}: {e}")
-
-# --- Reorder Consolidated Data ---
-ordered_data = OrderedDict() # Use OrderedDict to preserve insertion order
-processed_books = set()
-
-print("\nReordering books according to KJV order...")
-for book_name in KJV_BOOK_ORDER:
-    if book_name in consolidated_data:
-        ordered_data[book_name] = consolidated_data[book_name]
-        processed_books.add(book_name)
-        # print(f"  Added '{book_name}' to ordered data.") # Uncomment for verbose logging
-    else:
-        print(f"Warning: Book '{book_name}' from KJV order not found in the input JSON data.")
-
-# Check for books found in JSON but not in KJV standard list
-found_books = set(consolidated_data.keys())
-extra_books = found_books - processed_books # Use set difference
-if extra_books:
-    print("\nWarning: The following books were found in the JSON data but are not in the standard KJV order list:")
-    for book_name in sorted(list(extra_books)): # Sort alphabetically for consistent warning messages
-        print(f"  - {book_name}")
-        # Optionally, append these extra books to the end
-        # ordered_data[book_name] = consolidated_data[book_name]
-
-# --- Write Reordered Data to HTML ---
-if ordered_data: # Check if we have any data to write after ordering
-    print(f"\nWriting {len(ordered_data)} books to '{output_html_file}'...")
-    try:
-        with open(output_html_file, 'w', encoding='utf-8') as file:
-            file.write("<html><head><title>Bible Data (KJV Order)</title></head><body>\n") # Updated title
-            file.write("<script type=\"text/javascript\">\n") # Added type attribute
-            file.write("// --- !!! BIBLE DATA (KJV ORDER) !!! ---\n") # Updated comment
-            file.write("const simulatedBibleData = ")
-            # Dump the ordered_data. json.dumps respects OrderedDict order.
-            file.write(json.dumps(ordered_data, ensure_ascii=False, indent=4))
-            file.write(";\n")
-            file.write("// --- End Bible Data ---\n")
-            file.write("</script>\n")
-            # Optional: Add a message in the HTML body indicating completion or status
-            file.write("<h1>Bible data loaded into JavaScript variable 'simulatedBibleData'.</h1>\n")
-            file.write("</body></html>")
-
-        print(f"Conversion and ordering complete. HTML file saved as '{output_html_file}'.")
-    except IOError as e:
-        print(f"Error writing HTML file '{output_html_file}': {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred while writing the HTML file: {e}")
-else:
-     # Updated message if no data was processed or found
-     print(f"No valid JSON data found or processed according to KJV order from '{input_json_directory}'. Output file '{output_html_file}' not created or updated.")
+import hashlib
+import json
+import os
+from functools import partial
+from multiprocessing import Pool
+
+from bible_build_cache import BookBuildCache, source_fingerprint
+from bible_codec import codec_fingerprint, convert_book_unchecked, decode_books, dumps_compact, dumps_indented, loads
+from bible_metrics import BuildMetrics, ConsoleMetrics, run_profiled
+from bible_search_index import INDEX_VERSION as SEARCH_INDEX_VERSION, SEARCH_JS, SearchIndexBuilder
+from bible_verse_store import STORE_VERSION as VERSE_STORE_VERSION, VerseStoreWriter
+
+# Define input directory and output file paths
+input_json_directory = 'Bible'
+output_html_file = 'bible.html'
+# Number of worker processes used to parse and convert the book files.
+# None uses one worker per CPU core; 1 processes the files serially in this process.
+ingest_workers = None
+# Directory of the incremental build cache. Unchanged book files are not re-parsed and
+# a rebuild with no changed inputs is skipped entirely. Set to None to always rebuild.
+build_cache_directory = '.bible_build_cache'
+# How the data is written:
+#   'inline'         - the whole canon as one simulatedBibleData literal inside the HTML
+#   'book_shards'    - one minified JSON file per book, fetched by the page on demand
+#   'chapter_shards' - one minified JSON file per chapter, fetched by the page on demand
+output_mode = 'inline'
+# Directory (relative to the HTML file) that receives the shards in the shard modes.
+# Each page writes into its own subdirectory, named after the HTML file.
+shard_directory = 'bible_data'
+# Optional binary verse store (see bible_verse_store.py) written alongside the HTML,
+# e.g. 'bible.verses'. None skips it.
+verse_store_file = None
+# Optional full-text search index (see bible_search_index.py), e.g. 'bible.search'.
+# A JSON shard for the page is written next to it (with '.json' appended) and the
+# page gets a searchBible(query) function that loads it on first use.
+search_index_file = None
+# Instrumentation (see bible_metrics.py). With a report file the build is timed per
+# stage, verses and bytes are counted and warnings are collected instead of printed,
+# then written out as a JSON report with a short summary on the console. With a
+# profile file the build also runs under cProfile and the stats are saved there.
+metrics_report_file = None # e.g. 'bible_metrics.json'
+profile_file = None # e.g. 'bible_build.prof'
+
+# --- KJV Book Order ---
+# Define the canonical order of books in the KJV Bible
+KJV_BOOK_ORDER = [
+    # Old Testament
+    "Genesis", "Exodus", "Leviticus", "Numbers", "Deuteronomy", "Joshua", "Judges", "Ruth",
+    "1 Samuel", "2 Samuel", "1 Kings", "2 Kings", "1 Chronicles", "2 Chronicles", "Ezra",
+    "Nehemiah", "Esther", "Job", "Psalms", "Proverbs", "Ecclesiastes", "Song of Solomon",
+    "Isaiah", "Jeremiah", "Lamentations", "Ezekiel", "Daniel", "Hosea", "Joel", "Amos",
+    "Obadiah", "Jonah", "Micah", "Nahum", "Habakkuk", "Zephaniah", "Haggai", "Zechariah", "Malachi",
+    # New Testament
+    "Matthew", "Mark", "Luke", "John", "Acts", "Romans", "1 Corinthians", "2 Corinthians",
+    "Galatians", "Ephesians", "Philippians", "Colossians", "1 Thessalonians", "2 Thessalonians",
+    "1 Timothy", "2 Timothy", "Titus", "Philemon", "Hebrews", "James", "1 Peter", "2 Peter",
+    "1 John", "2 John", "3 John", "Jude", "Revelation"
+]
+# Create a set for quick lookups of expected books
+KJV_BOOKS_SET = set(KJV_BOOK_ORDER)
+
+# Function to convert JSON structure (assumed to be a dictionary for a single book)
+# to desired JavaScript format. Warnings go through warn (print by default) so that
+# an instrumented build can collect them.
+def convert_book_json_to_js(book_data, warn=print):
+    # Check if the input is actually a dictionary with the expected 'book' key
+    if not isinstance(book_data, dict) or 'book' not in book_data:
+        # Log an error or warning if the structure is unexpected
+        warn(f"Warning: Skipping item with unexpected format: {type(book_data)}")
+        return None # Return None to indicate failure
+
+    book_name = book_data['book']
+    chapters = []
+    # Check if 'chapters' key exists and is a list
+    if 'chapters' in book_data and isinstance(book_data['chapters'], list):
+        for chapter in book_data['chapters']:
+            # Basic check for chapter structure
+            if isinstance(chapter, dict) and 'chapter' in chapter and 'verses' in chapter and isinstance(chapter['verses'], list):
+                try:
+                    # Sort verses numerically before creating chapter object
+                    sorted_verses = sorted(chapter["verses"], key=lambda v: int(v.get("verse", 0)))
+
+                    chapter_obj = {
+                        "chapter": int(chapter["chapter"]),
+                        "verses": [
+                            {
+                                "verse": int(verse["verse"]),
+                                "text": verse["text"]
+                            }
+                            # Check verse structure before processing
+                            for verse in sorted_verses if isinstance(verse, dict) and 'verse' in verse and 'text' in verse
+                        ]
+                    }
+                    chapters.append(chapter_obj)
+                except (ValueError, KeyError, TypeError) as e:
+                     warn(f"Warning: Skipping chapter/verse due to invalid data in book '{book_name}', chapter '{chapter.get('chapter', 'N/A')}': {e}")
+            else:
+                warn(f"Warning: Skipping chapter with unexpected format in book '{book_name}': {chapter}")
+    else:
+         warn(f"Warning: 'chapters' key missing or not a list in book '{book_name}'")
+
+    # Sort chapters numerically before returning book data
+    if chapters:
+        chapters.sort(key=lambda c: c.get("chapter", 0))
+        return {book_name: {"chapters": chapters}}
+    else:
+        warn(f"Warning: No valid chapters found for book '{book_name}'. Skipping this book.")
+        return None
+
+
+# Map a normalized file name (e.g. "1samuel") to its position in the KJV order so the
+# files can be handed to the workers roughly in canonical order. Books then tend to
+# finish in the order they are written out and little has to be held back.
+KJV_FILE_KEYS = {name.replace(' ', '').lower(): index for index, name in enumerate(KJV_BOOK_ORDER)}
+
+def kjv_file_sort_key(json_file):
+    stem = os.path.splitext(json_file)[0].replace(' ', '').replace('_', '').lower()
+    return (KJV_FILE_KEYS.get(stem, len(KJV_BOOK_ORDER)), json_file)
+
+# Serialize a single converted book exactly as it appears inside the pretty-printed
+# canon. json.dumps of a one-book dict yields the same lines the book occupies in
+# json.dumps of the whole dict, so stripping the surrounding "{\n" and "\n}" gives a
+# fragment that can be joined with ",\n" without re-serializing everything.
+def serialize_book_fragment(book_name, book_value):
+    return dumps_indented({book_name: book_value})[2:-2]
+
+# Serialize a converted book for the given output mode: the pretty-printed fragment
+# for 'inline', one minified JSON document for 'book_shards', or a list of
+# [chapter, minified JSON] pairs for 'chapter_shards'.
+def serialize_book(book_name, book_value, output_mode):
+    if output_mode == 'inline':
+        return serialize_book_fragment(book_name, book_value)
+    if output_mode == 'book_shards':
+        return dumps_compact(book_value)
+    if output_mode == 'chapter_shards':
+        return [
+            [chapter["chapter"], dumps_compact(chapter)]
+            for chapter in book_value["chapters"]
+        ]
+    raise ValueError(f"Unknown output mode '{output_mode}'")
+
+# Convert already-parsed book data (one book dict, or a list of them) into
+# [(book_name, {"chapters": [...]}), ...]. Well-formed books take the unchecked
+# conversion; anything else goes through the checked one, which reports it.
+# source_name is only used in messages.
+def convert_book_items(input_data, source_name, metrics):
+    # Check if input_data is a list or a dictionary
+    if isinstance(input_data, list):
+        # If it's a list, process each item assuming it's a book dictionary
+        metrics.info(f"  File contains a list. Processing {len(input_data)} items.") # Debugging
+        books_in_file = input_data
+    elif isinstance(input_data, dict):
+        # If it's a dictionary, treat it as a single book item
+        metrics.info("  File contains a dictionary. Processing directly.") # Debugging
+        books_in_file = [input_data]
+    else:
+        # Handle cases where the root JSON element is neither list nor dict
+        metrics.warn(f"Warning: Skipping file {os.path.basename(source_name)} - root element is not a list or dictionary.")
+        return []
+
+    with metrics.stage('convert'):
+        converted = []
+        for book_item in books_in_file:
+            book = convert_book_unchecked(book_item)
+            if book is None:
+                js_data = convert_book_json_to_js(book_item, metrics.warn)
+                if js_data: # Only keep the book if conversion was successful
+                    book = next(iter(js_data.items()))
+            if book is not None:
+                converted.append(book)
+    if metrics.collecting:
+        for _, book_value in converted:
+            metrics.count('books_converted')
+            metrics.count('chapters', len(book_value["chapters"]))
+            metrics.count('verses', sum(len(chapter["verses"]) for chapter in book_value["chapters"]))
+    return converted
+
+# Decode the raw bytes of one book file and convert every book in it (see
+# convert_book_items). Raises json.JSONDecodeError on malformed JSON.
+def convert_book_bytes(raw_data, source_name, metrics):
+    metrics.count('input_bytes', len(raw_data))
+    # Decode straight into the declared book schema when msgspec is available
+    # (decoding and converting are then one step, timed as 'decode')
+    with metrics.stage('decode'):
+        converted = decode_books(raw_data)
+        if converted is None:
+            input_data = loads(raw_data)
+    if converted is None:
+        return convert_book_items(input_data, source_name, metrics)
+    if metrics.collecting:
+        for _, book_value in converted:
+            metrics.count('books_converted')
+            metrics.count('chapters', len(book_value["chapters"]))
+            metrics.count('verses', sum(len(chapter["verses"]) for chapter in book_value["chapters"]))
+    return converted
+
+# Parse one input file and convert every book in it. This runs inside the worker
+# processes, so it returns (book_name, fragment, book_value) entries with the book
+# already serialized for the output mode. The converted book_value is only sent
+# back when include_data is set (exporters need it); otherwise it is None, to keep
+# what is sent back small. Returns None if the file
+# could not be read or decoded, so that the failure is not cached. Messages, timings
+# and counts go to metrics (see bible_metrics.py); by default messages are printed.
+def load_book_file(file_path, output_mode='inline', include_data=False, metrics=None):
+    metrics = metrics or ConsoleMetrics()
+    metrics.info(f"Processing file: {file_path}") # Added for debugging
+    books = []
+    try:
+        with metrics.stage('read'):
+            with open(file_path, 'rb') as file:
+                raw_data = file.read()
+        metrics.count('files_parsed')
+        for book_name, book_value in convert_book_bytes(raw_data, file_path, metrics):
+            with metrics.stage('serialize'):
+                fragment = serialize_book(book_name, book_value, output_mode)
+            books.append((book_name, fragment, book_value if include_data else None))
+
+    except json.JSONDecodeError as e:
+        metrics.warn(f"Error decoding JSON from file {file_path}: {e}")
+        return None
+    except Exception as e:
+        metrics.warn(f"Error processing file {file_path}: {e}")
+        return None
+    return books
+
+# Worker entry point. With collect_metrics the worker measures into its own
+# BuildMetrics and sends a snapshot back for the parent to merge.
+def load_book_file_with_path(file_path, output_mode='inline', include_data=False, collect_metrics=False):
+    metrics = BuildMetrics() if collect_metrics else None
+    books = load_book_file(file_path, output_mode, include_data, metrics)
+    return file_path, books, metrics.snapshot() if metrics else None
+
+# Yield the converted books of every file, in the order of file_paths, either from a
+# pool of worker processes or serially when only one worker is requested. With a
+# build cache, files whose content hash is already cached are served from the cache
+# and only the remaining files are parsed; their results are added to the cache.
+# Cache hits keep their place among the parsed files, so a cached build hands the
+# books over in the same order as a cold one.
+def ingest_book_files(file_paths, workers=None, cache=None, file_hashes=None, output_mode='inline', include_data=False,
+                      metrics=None):
+    metrics = metrics or ConsoleMetrics()
+    to_parse = file_paths
+    if cache is not None:
+        with metrics.stage('cache'):
+            to_parse = [file_path for file_path in file_paths if not cache.has(file_hashes[file_path])]
+
+    load = partial(load_book_file_with_path, output_mode=output_mode, include_data=include_data,
+                   collect_metrics=metrics.collecting)
+    pool = None
+    if workers == 1 or len(to_parse) <= 1:
+        results = map(load, to_parse)
+    else:
+        pool = Pool(processes=workers)
+        # Ordered imap with chunksize=1 hands out one file at a time, and the files are
+        # in KJV order, so results stream back roughly as the books are written out
+        results = pool.imap(load, to_parse, chunksize=1)
+    try:
+        parsed = cache_book_results(results, cache, file_hashes, metrics)
+        parse_next = set(to_parse)
+        for file_path in file_paths:
+            if file_path in parse_next:
+                yield next(parsed)
+                continue
+            with metrics.stage('cache'):
+                books = cache.get(file_hashes[file_path])
+            if books is None:
+                # Dropped from the cache since it was checked: parse it here
+                yield from cache_book_results([load(file_path)], cache, file_hashes, metrics)
+            else:
+                metrics.count('files_cached')
+                yield books
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+def cache_book_results(results, cache, file_hashes, metrics):
+    for file_path, books, snapshot in results:
+        metrics.merge_worker(snapshot)
+        if books is not None and cache is not None:
+            with metrics.stage('cache'):
+                cache.put(file_hashes[file_path], books)
+        yield books or []
+
+# Yield the book entries in KJV order as the file results stream in. A book is
+# yielded as soon as it and every book before it in KJV_BOOK_ORDER have arrived;
+# later books are held until then, so memory stays around one book instead of the
+# whole canon. Books missing from the input cannot be known until all files are
+# read, so the remaining held books are flushed in order at the end.
+def order_books_kjv(file_results, metrics=None):
+    metrics = metrics or ConsoleMetrics()
+    pending = {}
+    yielded_books = set()
+    extra_books = set()
+    next_index = 0
+
+    for books in file_results:
+        for book in books:
+            book_name = book[0]
+            if book_name not in KJV_BOOKS_SET:
+                extra_books.add(book_name)
+                continue
+            # Files arrive in input order and the first copy wins, so a book can be
+            # written out without waiting for the files after it
+            if book_name in yielded_books or book_name in pending:
+                metrics.warn(f"Warning: Duplicate data found for book '{book_name}'. Keeping the copy from the earlier file.")
+                continue
+            pending[book_name] = book
+
+        # Release every book whose predecessors have all been released
+        while next_index < len(KJV_BOOK_ORDER) and KJV_BOOK_ORDER[next_index] in pending:
+            book_name = KJV_BOOK_ORDER[next_index]
+            yielded_books.add(book_name)
+            yield pending.pop(book_name)
+            next_index += 1
+
+    metrics.info("\nReordering books according to KJV order...")
+    for book_name in KJV_BOOK_ORDER[next_index:]:
+        if book_name in pending:
+            yielded_books.add(book_name)
+            yield pending.pop(book_name)
+        elif book_name not in yielded_books:
+            metrics.warn(f"Warning: Book '{book_name}' from KJV order not found in the input JSON data.")
+
+    # Check for books found in JSON but not in KJV standard list
+    if extra_books:
+        if metrics.collecting:
+            for book_name in sorted(extra_books):
+                metrics.warn(f"Warning: Book '{book_name}' found in the JSON data is not in the standard KJV order list.")
+        else:
+            print("\nWarning: The following books were found in the JSON data but are not in the standard KJV order list:")
+            for book_name in sorted(extra_books): # Sort alphabetically for consistent warning messages
+                print(f"  - {book_name}")
+
+# Hand every ordered book to the exporters (anything with add_book(name, value),
+# such as VerseStoreWriter) on its way to the HTML writer.
+def export_books(ordered_books, exporters):
+    for book in ordered_books:
+        for exporter in exporters:
+            exporter.add_book(book[0], book[2])
+        yield book
+
+# Stream the ordered books into an open text file as one HTML page holding the
+# whole canon in the simulatedBibleData variable. Nothing is written if there are no
+# books. extra_script is appended inside the script tag. Returns the number of
+# books written.
+def write_inline_html_to(ordered_books, file, extra_script=''):
+    books_written = 0
+    for book_name, fragment, _ in ordered_books:
+        if not books_written:
+            file.write("<html><head><title>Bible Data (KJV Order)</title></head><body>\n") # Updated title
+            file.write("<script type=\"text/javascript\">\n") # Added type attribute
+            file.write("// --- !!! BIBLE DATA (KJV ORDER) !!! ---\n") # Updated comment
+            file.write("const simulatedBibleData = {\n")
+        else:
+            file.write(",\n")
+        file.write(fragment)
+        books_written += 1
+
+    if books_written:
+        file.write("\n};\n")
+        file.write("// --- End Bible Data ---\n")
+        file.write(extra_script)
+        file.write("</script>\n")
+        # Optional: Add a message in the HTML body indicating completion or status
+        file.write("<h1>Bible data loaded into JavaScript variable 'simulatedBibleData'.</h1>\n")
+        file.write("</body></html>")
+    return books_written
+
+# Write the inline page to output_path. The file is written under a temporary name
+# and only moved into place once complete. Returns the number of books written.
+def write_inline_html(ordered_books, output_path, extra_script=''):
+    temp_path = output_path + '.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            books_written = write_inline_html_to(ordered_books, file, extra_script)
+        if books_written:
+            os.replace(temp_path, output_path)
+    finally:
+        # Don't leave a partial output behind if anything went wrong
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return books_written
+
+# Loader emitted into the sharded HTML page. simulatedBibleData starts empty and each
+# book is fetched (and cached) the first time it is requested, so the page only
+# downloads the manifest up front.
+SHARD_LOADER_JS = """const simulatedBibleData = {};
+const bibleShardRequests = {};
+function fetchBibleShard(path) {
+    if (!(path in bibleShardRequests)) {
+        bibleShardRequests[path] = fetch(path).then(function (response) {
+            if (!response.ok) {
+                delete bibleShardRequests[path];
+                throw new Error("Failed to load " + path + ": " + response.status);
+            }
+            return response.json();
+        });
+    }
+    return bibleShardRequests[path];
+}
+// Load one chapter: resolves to {chapter, verses}
+function loadBibleChapter(bookName, chapter) {
+    const entry = bibleShardManifest[bookName];
+    if (entry === undefined) {
+        return Promise.reject(new Error("Unknown book: " + bookName));
+    }
+    if (typeof entry === "string") {
+        return loadBibleBook(bookName).then(function (book) {
+            return book.chapters.find(function (c) { return c.chapter === Number(chapter); });
+        });
+    }
+    if (!(String(chapter) in entry)) {
+        return Promise.reject(new Error("Unknown chapter: " + bookName + " " + chapter));
+    }
+    return fetchBibleShard(entry[String(chapter)]);
+}
+// Load a whole book: resolves to {chapters: [...]} and stores it in simulatedBibleData
+function loadBibleBook(bookName) {
+    if (bookName in simulatedBibleData) {
+        return Promise.resolve(simulatedBibleData[bookName]);
+    }
+    const entry = bibleShardManifest[bookName];
+    if (entry === undefined) {
+        return Promise.reject(new Error("Unknown book: " + bookName));
+    }
+    const request = typeof entry === "string"
+        ? fetchBibleShard(entry)
+        : Promise.all(Object.keys(entry).map(function (chapter) {
+            return fetchBibleShard(entry[chapter]);
+        })).then(function (chapters) { return {chapters: chapters}; });
+    return request.then(function (book) {
+        simulatedBibleData[bookName] = book;
+        return book;
+    });
+}
+"""
+
+# Write one minified shard and return its path relative to the HTML file. The file
+# name carries a hash of the contents so shards can be cached forever by browsers
+# and unchanged shards are not rewritten.
+def write_shard(output_directory, relative_stem, content):
+    data = content.encode('utf-8')
+    relative_path = f"{relative_stem}.{hashlib.blake2b(data, digest_size=6).hexdigest()}.json"
+    shard_path = os.path.join(output_directory, relative_path)
+    if not os.path.exists(shard_path):
+        os.makedirs(os.path.dirname(shard_path), exist_ok=True)
+        temp_path = f"{shard_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, shard_path)
+    return relative_path
+
+# Directory (relative to the HTML file) holding one page's shards. Every page gets
+# its own subdirectory of shard_directory, named after the page, so pages sharing a
+# shard_directory never touch each other's shards.
+def shard_namespace(output_path, shard_directory):
+    return f"{shard_directory}/{os.path.splitext(os.path.basename(output_path))[0]}"
+
+# Write each ordered book as minified per-book (or per-chapter) shards under the
+# page's shard namespace, next to an HTML page that only embeds the shard manifest
+# and the loader. Shards left over from earlier builds of the same page are removed
+# once the page is replaced. extra_script is appended inside the script tag. If
+# shard_paths is a list, the path of every shard the page refers to is appended to
+# it. Returns the number of books written.
+def write_sharded_html(ordered_books, output_path, shard_directory, extra_script='', shard_paths=None):
+    output_directory = os.path.dirname(os.path.abspath(output_path))
+    namespace = shard_namespace(output_path, shard_directory)
+    manifest = {}
+    for book_name, fragment, _ in ordered_books:
+        book_number = KJV_BOOK_ORDER.index(book_name) + 1
+        stem = f"{namespace}/{book_number:02d}-{book_name.replace(' ', '-').lower()}"
+        if isinstance(fragment, str):
+            manifest[book_name] = write_shard(output_directory, stem, fragment)
+        else:
+            manifest[book_name] = {
+                str(chapter): write_shard(output_directory, f"{stem}/{chapter}", content)
+                for chapter, content in fragment
+            }
+    if not manifest:
+        return 0
+
+    temp_path = output_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write("<html><head><title>Bible Data (KJV Order)</title></head><body>\n")
+        file.write("<script type=\"text/javascript\">\n")
+        file.write("// --- !!! BIBLE DATA (KJV ORDER, LOADED ON DEMAND) !!! ---\n")
+        file.write("const bibleShardManifest = ")
+        file.write(dumps_compact(manifest))
+        file.write(";\n")
+        file.write(SHARD_LOADER_JS)
+        file.write("// --- End Bible Data ---\n")
+        file.write(extra_script)
+        file.write("</script>\n")
+        file.write("<h1>Bible books load on demand into 'simulatedBibleData' via loadBibleBook(name).</h1>\n")
+        file.write("</body></html>")
+    os.replace(temp_path, output_path)
+
+    # Remove shards of this page that the new page no longer refers to
+    live_shards = set()
+    for entry in manifest.values():
+        live_shards.update([entry] if isinstance(entry, str) else entry.values())
+    live_shards = {os.path.normpath(os.path.join(output_directory, path)) for path in live_shards}
+    namespace_directory = os.path.normpath(os.path.join(output_directory, namespace))
+    for root, _, files in os.walk(namespace_directory, topdown=False):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if name.endswith('.json') and path not in live_shards:
+                os.remove(path)
+        if root != namespace_directory and not os.listdir(root):
+            os.rmdir(root)
+    if shard_paths is not None:
+        shard_paths.extend(sorted(live_shards))
+    return len(manifest)
+
+# --- Main Processing Logic ---
+
+# Build the page (and any exports) for one input directory. Returns the number of
+# books written, 0 if nothing could be written, or None if the outputs were already
+# up to date (or the input directory is missing). Pass a BuildMetrics as metrics to
+# instrument the build; by default messages are printed as they come.
+def build_bible(input_json_directory, output_html_file, output_mode='inline', shard_directory='bible_data',
+                verse_store_file=None, search_index_file=None, build_cache_directory='.bible_build_cache',
+                ingest_workers=None, metrics=None):
+    metrics = metrics or ConsoleMetrics()
+    # Check if the directory exists
+    if not os.path.isdir(input_json_directory):
+        metrics.warn(f"Error: Input directory not found at '{input_json_directory}'")
+        return None
+
+    with metrics.stage('scan'):
+        json_files = sorted((f for f in os.listdir(input_json_directory) if f.endswith('.json')), key=kjv_file_sort_key)
+        file_paths = [os.path.join(input_json_directory, json_file) for json_file in json_files]
+        metrics.count('files', len(file_paths))
+
+        cache = file_hashes = build_key = None
+        if build_cache_directory:
+            variant = f"reorder-{output_mode}{'-data' if verse_store_file or search_index_file else ''}-"
+            # Each input directory gets its own index so several builds can run at once
+            index_name = 'index-' + hashlib.blake2b(os.path.abspath(input_json_directory).encode('utf-8'), digest_size=6).hexdigest()
+            cache = BookBuildCache(build_cache_directory, variant + source_fingerprint(__file__) + '-' + codec_fingerprint(),
+                                   index_name)
+            file_hashes = cache.fingerprint_files(file_paths)
+            build_key = cache.build_key(file_hashes, output_mode, shard_directory, verse_store_file, search_index_file,
+                                        VERSE_STORE_VERSION if verse_store_file else None,
+                                        SEARCH_INDEX_VERSION if search_index_file else None)
+
+    output_files = [output_html_file] + [path for path in [verse_store_file, search_index_file] if path]
+    shard_paths = []
+    books_written = 0
+    if cache is not None and all(cache.output_is_current(path, build_key) for path in output_files):
+        print(f"No input changes since the last build. '{output_html_file}' is up to date.")
+        books_written = None
+    else:
+        exporters = []
+        try:
+            extra_script = ''
+            if verse_store_file:
+                exporters.append(VerseStoreWriter(verse_store_file, metrics.warn))
+            if search_index_file:
+                search_shard_file = search_index_file + '.json'
+                exporters.append(SearchIndexBuilder(search_index_file, search_shard_file, metrics.warn))
+                shard_url = os.path.relpath(os.path.abspath(search_shard_file),
+                                            os.path.dirname(os.path.abspath(output_html_file)))
+                extra_script = (f"const bibleSearchShardPath = {json.dumps(shard_url.replace(os.sep, '/'))};\n"
+                                + SEARCH_JS)
+            # Each generator stage is charged only for its own work (see bible_metrics.py)
+            file_results = metrics.timed(ingest_book_files(file_paths, ingest_workers, cache, file_hashes, output_mode,
+                                                           include_data=bool(exporters), metrics=metrics), 'ingest')
+            ordered_books = metrics.timed(order_books_kjv(file_results, metrics), 'reorder')
+            if exporters:
+                ordered_books = metrics.timed(export_books(ordered_books, exporters), 'export')
+            with metrics.stage('write'):
+                if output_mode == 'inline':
+                    books_written = write_inline_html(ordered_books, output_html_file, extra_script)
+                else:
+                    books_written = write_sharded_html(ordered_books, output_html_file, shard_directory, extra_script,
+                                                       shard_paths)
+            if books_written:
+                with metrics.stage('export'):
+                    for exporter in exporters:
+                        exporter.close()
+                if verse_store_file:
+                    metrics.info(f"Verse store saved as '{verse_store_file}'.")
+                if search_index_file:
+                    metrics.info(f"Search index saved as '{search_index_file}' (page shard '{search_shard_file}').")
+        except IOError as e:
+            metrics.warn(f"Error writing HTML file '{output_html_file}': {e}")
+        except Exception as e:
+            metrics.warn(f"An unexpected error occurred while writing the HTML file: {e}")
+
+    if books_written:
+        metrics.count('books_written', books_written)
+        metrics.count('output_bytes', sum(os.path.getsize(path) for path in output_files + shard_paths))
+    if cache is not None:
+        with metrics.stage('cache'):
+            if books_written:
+                cache.record_output(output_html_file, build_key, shard_paths)
+                for path in output_files[1:]:
+                    cache.record_output(path, build_key)
+            cache.save()
+
+    if books_written:
+        print(f"\nWrote {books_written} books to '{output_html_file}'.")
+        print(f"Conversion and ordering complete. HTML file saved as '{output_html_file}'.")
+    elif books_written == 0:
+        # Updated message if no data was processed or found
+        print(f"No valid JSON data found or processed according to KJV order from '{input_json_directory}'. Output file '{output_html_file}' not created or updated.")
+    return books_written
+
+if __name__ == '__main__':
+    metrics = BuildMetrics() if metrics_report_file or profile_file else None
+    settings = dict(output_mode=output_mode, shard_directory=shard_directory, verse_store_file=verse_store_file,
+                    search_index_file=search_index_file, build_cache_directory=build_cache_directory,
+                    ingest_workers=ingest_workers, metrics=metrics)
+    if profile_file:
+        run_profiled(profile_file, build_bible, input_json_directory, output_html_file, **settings)
+        print(f"Profile saved as '{profile_file}'.")
+    else:
+        build_bible(input_json_directory, output_html_file, **settings)
+    if metrics is not None:
+        print(metrics.summary())
+        if metrics_report_file:
+            metrics.write_report(metrics_report_file)
+            print(f"Metrics report saved as '{metrics_report_file}'.")
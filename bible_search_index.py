@@ -0,0 +1,440 @@
+import base64
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_right
+
+# Optional: with NumPy installed, queries intersect whole posting lists at once
+# instead of checking one posting at a time (pip install numpy)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Full-text index over the verses of a converted Bible.
+#
+# Every verse is tokenized and the token ids of the whole canon are stored back to
+# back (the "corpus"), with verse_starts marking where each verse begins. The
+# postings of a token are the corpus positions at which it occurs, sorted, so a
+# posting gives both the verse (by bisecting verse_starts) and the position inside
+# it. Phrase queries start from the rarest phrase term and check the neighbouring
+# corpus positions for the other terms; all-words queries start from the verses of
+# the rarest term and drop those that lack any of the other terms. With NumPy each
+# step handles a whole posting list at once, using a verse id per corpus position
+# that is built on the first query.
+#
+# File layout: magic, header size, JSON header (book names, vocabulary, array
+# lengths), then the little-endian uint32 arrays verse_refs (book, chapter, verse
+# per verse), verse_starts, corpus, posting_starts and postings, each aligned to 4
+# bytes so they can be used in place from a memory map.
+#
+# The JSON shard for the browser is compact instead: verse lengths in place of
+# verse_starts, posting counts in place of posting_starts, and the postings as
+# base64 LEB128 varints of the gaps between a token's positions (the first one
+# counted from 0). The corpus is left out; SEARCH_JS rebuilds it from the postings.
+INDEX_MAGIC = b'BSI1'
+INDEX_VERSION = 2
+ARRAY_NAMES = ('verse_refs', 'verse_starts', 'corpus', 'posting_starts', 'postings')
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# str.translate table that drops marks, filled in per character on first sight
+class MarkTable(dict):
+    def __missing__(self, code_point):
+        self[code_point] = None if unicodedata.category(chr(code_point)).startswith('M') else code_point
+        return self[code_point]
+
+STRIP_MARKS = MarkTable()
+
+# Lower-case, strip accents and split into word tokens. Every mark (category M,
+# including spacing marks such as Devanagari vowel signs) is dropped, like \p{M} in
+# the JavaScript side (see SEARCH_JS), so both produce the same tokens.
+def tokenize(text):
+    if not text.isascii(): # ASCII text has nothing to decompose or strip
+        text = unicodedata.normalize('NFKD', text).translate(STRIP_MARKS)
+    return TOKEN_PATTERN.findall(text.lower())
+
+# LEB128: seven bits per byte, low bits first, high bit set on all but the last byte
+def encode_varints(values):
+    data = bytearray()
+    append = data.append
+    for value in values:
+        while value >= 0x80:
+            append(value & 0x7F | 0x80)
+            value >>= 7
+        append(value)
+    return bytes(data)
+
+# Gaps between the consecutive postings of each token, the first one from 0
+def posting_gaps(posting_starts, postings):
+    gaps = array('I', postings)
+    for token_id in range(len(posting_starts) - 1):
+        for index in range(posting_starts[token_id] + 1, posting_starts[token_id + 1]):
+            gaps[index] = postings[index] - postings[index - 1]
+    return gaps
+
+# Collects the verses of each converted book handed to add_book() (in output
+# order) and writes the index file, plus optionally a JSON shard for the browser.
+# Verses that cannot be indexed (negative numbers, text that is not a string) are
+# reported through warn and left out.
+class SearchIndexBuilder:
+    def __init__(self, path, shard_path=None, warn=print):
+        self.path = path
+        self.shard_path = shard_path
+        self.warn = warn
+        self.book_names = []
+        self.vocabulary = {}
+        self.verse_refs = array('I')
+        self.verse_starts = array('I')
+        self.corpus = array('I')
+
+    def add_book(self, book_name, book_value):
+        book_number = len(self.book_names)
+        self.book_names.append(book_name)
+        for chapter in book_value["chapters"]:
+            for verse in chapter["verses"]:
+                if chapter["chapter"] < 0 or verse["verse"] < 0:
+                    self.warn(f"Warning: Verse {book_name} {chapter['chapter']}:{verse['verse']} has a negative number "
+                              f"and is left out of the search index.")
+                    continue
+                if not isinstance(verse["text"], str):
+                    self.warn(f"Warning: Verse {book_name} {chapter['chapter']}:{verse['verse']} has no text "
+                              f"and is left out of the search index.")
+                    continue
+                self.verse_refs.extend((book_number, chapter["chapter"], verse["verse"]))
+                self.verse_starts.append(len(self.corpus))
+                for token in tokenize(verse["text"]):
+                    token_id = self.vocabulary.get(token)
+                    if token_id is None:
+                        token_id = self.vocabulary[token] = len(self.vocabulary)
+                    self.corpus.append(token_id)
+
+    # Counting sort of the corpus positions by token id
+    def _build_postings(self):
+        counts = array('I', bytes(4 * (len(self.vocabulary) + 1)))
+        for token_id in self.corpus:
+            counts[token_id + 1] += 1
+        for token_id in range(1, len(counts)):
+            counts[token_id] += counts[token_id - 1]
+        posting_starts = array('I', counts)
+        postings = array('I', bytes(4 * len(self.corpus)))
+        for position, token_id in enumerate(self.corpus):
+            postings[counts[token_id]] = position
+            counts[token_id] += 1
+        return posting_starts, postings
+
+    def close(self):
+        self.verse_starts.append(len(self.corpus))
+        posting_starts, postings = self._build_postings()
+        arrays = {
+            'verse_refs': self.verse_refs, 'verse_starts': self.verse_starts, 'corpus': self.corpus,
+            'posting_starts': posting_starts, 'postings': postings,
+        }
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        header = json.dumps({
+            'version': INDEX_VERSION, 'book_names': self.book_names, 'vocabulary': vocabulary,
+            'lengths': {name: len(arrays[name]) for name in ARRAY_NAMES},
+        }, ensure_ascii=False).encode('utf-8')
+        header += b' ' * (-len(header) % 4) # Keep the arrays 4-byte aligned
+
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(INDEX_MAGIC)
+            file.write(struct.pack('<I', len(header)))
+            file.write(header)
+            for name in ARRAY_NAMES:
+                values = arrays[name]
+                if sys.byteorder == 'big':
+                    values = array('I', values)
+                    values.byteswap()
+                file.write(values.tobytes())
+        os.replace(temp_path, self.path)
+
+        if self.shard_path:
+            shard = {
+                'books': self.book_names, 'vocabulary': vocabulary, 'verse_refs': self.verse_refs.tolist(),
+                'verse_lengths': [end - start for start, end in zip(self.verse_starts, self.verse_starts[1:])],
+                'posting_counts': [end - start for start, end in zip(posting_starts, posting_starts[1:])],
+                'postings': base64.b64encode(encode_varints(posting_gaps(posting_starts, postings))).decode('ascii'),
+            }
+            temp_path = self.shard_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(shard, file, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, self.shard_path)
+
+# Drop repeats from an ascending NumPy array
+def unique_sorted(values):
+    if len(values) < 2:
+        return values
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+# Query side of an index file. The arrays are used straight from a memory map, so
+# opening only costs reading the header.
+class SearchIndex:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:4] != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"'{path}' is not a search index")
+        header_size = struct.unpack_from('<I', self.data, 4)[0]
+        header = json.loads(self.data[8:8 + header_size].decode('utf-8'))
+        if header['version'] != INDEX_VERSION:
+            self.close()
+            raise ValueError(f"'{path}' is not a version {INDEX_VERSION} search index")
+        self.book_names = header['book_names']
+        self.token_ids = {token: token_id for token_id, token in enumerate(header['vocabulary'])}
+        offset = 8 + header_size
+        for name in ARRAY_NAMES:
+            length = header['lengths'][name]
+            if sys.byteorder == 'big':
+                values = array('I', self.data[offset:offset + 4 * length])
+                values.byteswap()
+            else:
+                values = memoryview(self.data)[offset:offset + 4 * length].cast('I')
+            setattr(self, name, values)
+            if np is not None:
+                # Views of the same memory map, for the vectorized queries
+                setattr(self, '_np_' + name, np.frombuffer(self.data, dtype='<u4', count=length, offset=offset))
+            offset += 4 * length
+        self._np_verse_of = None
+
+    def close(self):
+        for name in ARRAY_NAMES:
+            values = getattr(self, name, None)
+            if isinstance(values, memoryview):
+                values.release()
+            # The map can only be closed once no array refers to it any more
+            setattr(self, '_np_' + name, None)
+        self._np_verse_of = None
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def verse_count(self):
+        return len(self.verse_starts) - 1
+
+    def reference(self, verse_id):
+        book_number, chapter, verse = self.verse_refs[3 * verse_id:3 * verse_id + 3]
+        return (self.book_names[book_number], chapter, verse)
+
+    def _postings(self, token_id):
+        return self.postings[self.posting_starts[token_id]:self.posting_starts[token_id + 1]]
+
+    def _postings_array(self, token_id):
+        return self._np_postings[self._np_posting_starts[token_id]:self._np_posting_starts[token_id + 1]]
+
+    # Verse id of every corpus position (uint32, one per token), built on first use
+    def _verse_of_position(self):
+        if self._np_verse_of is None:
+            verse_starts = self._np_verse_starts
+            self._np_verse_of = np.repeat(np.arange(len(verse_starts) - 1, dtype=np.uint32), np.diff(verse_starts))
+        return self._np_verse_of
+
+    # Verse ids (ascending) containing the exact sequence of words in phrase
+    def search_phrase(self, phrase):
+        token_ids = [self.token_ids.get(token) for token in tokenize(phrase)]
+        if not token_ids or None in token_ids:
+            return []
+        if np is not None:
+            return self._search_phrase_np(token_ids)
+        # Walk the postings of the rarest term and compare the corpus around each one
+        # with the phrase; only matches pay for locating their verse.
+        anchor = min(range(len(token_ids)), key=lambda i: len(self._postings(token_ids[i])))
+        target = memoryview(array('I', token_ids))
+        corpus = self.corpus
+        length = len(token_ids)
+        corpus_size = len(corpus)
+        results = []
+        for position in self._postings(token_ids[anchor]):
+            start = position - anchor
+            if start < 0 or start + length > corpus_size or corpus[start:start + length] != target:
+                continue
+            verse_id = bisect_right(self.verse_starts, position) - 1
+            # The phrase must not run across a verse boundary
+            if start < self.verse_starts[verse_id] or start + length > self.verse_starts[verse_id + 1]:
+                continue
+            if not results or results[-1] != verse_id:
+                results.append(verse_id)
+        return results
+
+    def _search_phrase_np(self, token_ids):
+        postings_of = self._postings_array
+        anchor = min(range(len(token_ids)), key=lambda i: len(postings_of(token_ids[i])))
+        length = len(token_ids)
+        corpus = self._np_corpus
+        # Phrase start of every posting of the rarest term that leaves room for the phrase
+        starts = postings_of(token_ids[anchor]).astype(np.int64) - anchor
+        starts = starts[(starts >= 0) & (starts + length <= len(corpus))]
+        for offset, token_id in enumerate(token_ids):
+            if offset != anchor:
+                starts = starts[corpus[starts + offset] == token_id]
+        # The phrase must not run across a verse boundary
+        verse_of = self._verse_of_position()
+        verse_ids = verse_of[starts]
+        return unique_sorted(verse_ids[verse_ids == verse_of[starts + length - 1]]).tolist()
+
+    # Verse ids (ascending) containing every word of query, in any order
+    def search_all_words(self, query):
+        token_ids = {self.token_ids.get(token) for token in tokenize(query)}
+        if not token_ids or None in token_ids:
+            return []
+        if np is not None:
+            return self._search_all_words_np(token_ids)
+        rarest = min(token_ids, key=lambda token_id: len(self._postings(token_id)))
+        others = token_ids - {rarest}
+        results = []
+        last_verse_id = None
+        for position in self._postings(rarest):
+            verse_id = bisect_right(self.verse_starts, position) - 1
+            if verse_id == last_verse_id:
+                continue
+            last_verse_id = verse_id
+            verse_tokens = set(self.corpus[self.verse_starts[verse_id]:self.verse_starts[verse_id + 1]])
+            if others <= verse_tokens:
+                results.append(verse_id)
+        return results
+
+    def _search_all_words_np(self, token_ids):
+        postings_of = self._postings_array
+        verse_of = self._verse_of_position()
+        token_ids = sorted(token_ids, key=lambda token_id: len(postings_of(token_id)))
+        verse_ids = unique_sorted(verse_of[postings_of(token_ids[0])])
+        # Narrow the candidates down term by term, rarest first
+        for token_id in token_ids[1:]:
+            postings = postings_of(token_id)
+            if len(verse_ids) * 16 < len(postings):
+                # Few candidates: look for a posting inside each candidate's corpus range
+                verse_starts = self._np_verse_starts
+                first = np.searchsorted(postings, verse_starts[verse_ids])
+                verse_ids = verse_ids[first < np.searchsorted(postings, verse_starts[verse_ids + 1])]
+            else:
+                present = np.zeros(self.verse_count, dtype=bool)
+                present[verse_of[postings]] = True
+                verse_ids = verse_ids[present[verse_ids]]
+            if not len(verse_ids):
+                break
+        return verse_ids.tolist()
+
+    # Search and return (book, chapter, verse) references. A query wrapped in double
+    # quotes is a phrase query, anything else matches verses containing all words.
+    def search(self, query, limit=None):
+        query = query.strip()
+        if len(query) > 1 and query.startswith('"') and query.endswith('"'):
+            verse_ids = self.search_phrase(query[1:-1])
+        else:
+            verse_ids = self.search_all_words(query)
+        verse_ids = verse_ids[:limit]
+        if np is not None:
+            book_names = self.book_names
+            return [(book_names[book_number], chapter, verse)
+                    for book_number, chapter, verse in self._np_verse_refs.reshape(-1, 3)[verse_ids].tolist()]
+        return [self.reference(verse_id) for verse_id in verse_ids]
+
+# Browser-side search over the JSON shard written next to the page. The shard is
+# only fetched on the first search.
+SEARCH_JS = """let bibleSearchShard = null;
+function bibleTokenize(text) {
+    return text.normalize("NFKD").replace(/\\p{M}/gu, "").toLowerCase().match(/[\\p{L}\\p{N}_]+/gu) || [];
+}
+function loadBibleSearchIndex() {
+    if (bibleSearchShard === null) {
+        bibleSearchShard = fetch(bibleSearchShardPath).then(function (response) {
+            if (!response.ok) {
+                bibleSearchShard = null;
+                throw new Error("Failed to load " + bibleSearchShardPath + ": " + response.status);
+            }
+            return response.json();
+        }).then(function (shard) {
+            shard.tokenIds = new Map(shard.vocabulary.map(function (token, id) { return [token, id]; }));
+            // Expand the compact shard: offsets from the lengths, absolute postings from
+            // the varint gaps, and the corpus by placing every token at its postings
+            shard.verse_starts = new Uint32Array(shard.verse_lengths.length + 1);
+            shard.verse_lengths.forEach(function (length, i) { shard.verse_starts[i + 1] = shard.verse_starts[i] + length; });
+            shard.posting_starts = new Uint32Array(shard.posting_counts.length + 1);
+            shard.posting_counts.forEach(function (count, i) { shard.posting_starts[i + 1] = shard.posting_starts[i] + count; });
+            const bytes = atob(shard.postings);
+            const postings = new Uint32Array(shard.posting_starts[shard.posting_counts.length]);
+            const corpus = new Uint32Array(postings.length);
+            let offset = 0;
+            shard.posting_counts.forEach(function (count, id) {
+                let position = 0;
+                for (let end = shard.posting_starts[id] + count, i = shard.posting_starts[id]; i < end; i++) {
+                    let gap = 0, shift = 0, byte;
+                    do {
+                        byte = bytes.charCodeAt(offset++);
+                        gap += (byte & 0x7F) * Math.pow(2, shift);
+                        shift += 7;
+                    } while (byte & 0x80);
+                    position += gap;
+                    postings[i] = position;
+                    corpus[position] = id;
+                }
+            });
+            shard.postings = postings;
+            shard.corpus = corpus;
+            return shard;
+        });
+    }
+    return bibleSearchShard;
+}
+// Resolves to [{book, chapter, verse}, ...]. A query in double quotes is a phrase
+// query, anything else matches verses containing all of its words.
+function searchBible(query) {
+    return loadBibleSearchIndex().then(function (shard) {
+        query = query.trim();
+        const phrase = query.length > 1 && query[0] === '"' && query[query.length - 1] === '"';
+        const ids = bibleTokenize(phrase ? query.slice(1, -1) : query).map(function (t) { return shard.tokenIds.get(t); });
+        if (ids.length === 0 || ids.includes(undefined)) {
+            return [];
+        }
+        const postings = function (id) {
+            return shard.postings.slice(shard.posting_starts[id], shard.posting_starts[id + 1]);
+        };
+        const verseOf = function (position) {
+            let low = 0, high = shard.verse_starts.length - 1;
+            while (low < high) {
+                const mid = (low + high + 1) >> 1;
+                if (shard.verse_starts[mid] <= position) { low = mid; } else { high = mid - 1; }
+            }
+            return low;
+        };
+        let anchor = 0;
+        ids.forEach(function (id, i) { if (postings(id).length < postings(ids[anchor]).length) { anchor = i; } });
+        const results = [];
+        postings(ids[anchor]).forEach(function (position) {
+            const verseId = verseOf(position);
+            if (results.length && results[results.length - 1] === verseId) {
+                return;
+            }
+            const start = shard.verse_starts[verseId], end = shard.verse_starts[verseId + 1];
+            let match;
+            if (phrase) {
+                const first = position - anchor;
+                match = first >= start && first + ids.length <= end &&
+                    ids.every(function (id, i) { return shard.corpus[first + i] === id; });
+            } else {
+                const tokens = new Set(shard.corpus.slice(start, end));
+                match = ids.every(function (id) { return tokens.has(id); });
+            }
+            if (match) {
+                results.push(verseId);
+            }
+        });
+        return results.map(function (verseId) {
+            const ref = shard.verse_refs.slice(3 * verseId, 3 * verseId + 3);
+            return {book: shard.books[ref[0]], chapter: ref[1], verse: ref[2]};
+        });
+    });
+}
+"""
@@ -0,0 +1,194 @@
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import tempfile
+
+# Binary verse store: every verse text packed into one contiguous UTF-8 blob plus a
+# fixed-width index, so a reference is resolved with three struct lookups and a
+# slice of a memory-mapped file, without parsing any JSON.
+#
+# Layout (all integers little-endian):
+#   header       magic, version, book count, chapter entry count, verse slot count,
+#                size of the book name list, offset of the text blob
+#   book names   UTF-8 JSON list of the book names, in store order
+#   book table   per book:    (first chapter entry, number of chapter entries)
+#   chapter table per chapter: (first verse slot, number of verse slots)
+#   verse slots  per verse:   (offset in text blob, length in bytes)
+#   text blob    all verse texts, back to back
+#
+# Chapter entries are dense by chapter number and verse slots are dense by verse
+# number, both starting at 0 (some translations number Psalm superscriptions as
+# verse 0), so (book, chapter, verse) maps straight to a slot position. Chapters or
+# verses missing from the source take an empty entry / a slot with MISSING_OFFSET.
+STORE_MAGIC = b'BVS1'
+STORE_VERSION = 2
+HEADER = struct.Struct('<4sIIIIIQ')
+TABLE_ENTRY = struct.Struct('<II')
+MISSING_OFFSET = 0xFFFFFFFF
+
+# "John 3:16", "1 John 1:1-4", "Psalms 23" (whole chapter)
+REFERENCE_PATTERN = re.compile(r'^\s*(.+?)\s+(\d+)(?::(\d+)(?:\s*-\s*(\d+))?)?\s*$')
+
+def normalize_book_name(book_name):
+    return book_name.replace(' ', '').lower()
+
+# Builds a store file from converted books ({"chapters": [{"chapter", "verses": [...]}]})
+# handed over one at a time. Texts are streamed to a temporary file as they arrive;
+# only the fixed-width index is kept in memory until close(). Chapters and verses
+# with negative numbers, and verses whose text is not a string, cannot be stored;
+# they are reported through warn.
+class VerseStoreWriter:
+    def __init__(self, path, warn=print):
+        self.path = path
+        self.warn = warn
+        self.book_names = []
+        self.book_table = []
+        self.chapter_table = []
+        self.verse_slots = []
+        self.text_size = 0
+        self.text_file = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path)))
+
+    def add_book(self, book_name, book_value):
+        chapters = {}
+        for chapter in book_value["chapters"]:
+            if chapter["chapter"] < 0:
+                self.warn(f"Warning: Chapter {chapter['chapter']} of '{book_name}' has a negative number "
+                          f"and is left out of the verse store.")
+            else:
+                chapters[chapter["chapter"]] = chapter["verses"]
+        chapter_entries = max(chapters) + 1 if chapters else 0
+        self.book_names.append(book_name)
+        self.book_table.append((len(self.chapter_table), chapter_entries))
+        for chapter_number in range(chapter_entries):
+            verses = {}
+            for verse in chapters.get(chapter_number, ()):
+                if verse["verse"] < 0:
+                    self.warn(f"Warning: Verse {book_name} {chapter_number}:{verse['verse']} has a negative number "
+                              f"and is left out of the verse store.")
+                elif not isinstance(verse["text"], str):
+                    self.warn(f"Warning: Verse {book_name} {chapter_number}:{verse['verse']} has no text "
+                              f"and is left out of the verse store.")
+                else:
+                    verses[verse["verse"]] = verse["text"]
+            verse_slots = max(verses) + 1 if verses else 0
+            self.chapter_table.append((len(self.verse_slots), verse_slots))
+            for verse_number in range(verse_slots):
+                text = verses.get(verse_number)
+                if text is None:
+                    self.verse_slots.append((MISSING_OFFSET, 0))
+                    continue
+                data = text.encode('utf-8')
+                self.text_file.write(data)
+                self.verse_slots.append((self.text_size, len(data)))
+                self.text_size += len(data)
+        if self.text_size >= MISSING_OFFSET:
+            raise ValueError("Verse store text blob exceeds 4 GiB")
+
+    def close(self):
+        names = json.dumps(self.book_names, ensure_ascii=False).encode('utf-8')
+        text_offset = (HEADER.size + len(names)
+                       + TABLE_ENTRY.size * (len(self.book_table) + len(self.chapter_table) + len(self.verse_slots)))
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(HEADER.pack(STORE_MAGIC, STORE_VERSION, len(self.book_table), len(self.chapter_table),
+                                       len(self.verse_slots), len(names), text_offset))
+                file.write(names)
+                for table in (self.book_table, self.chapter_table, self.verse_slots):
+                    file.write(b''.join(TABLE_ENTRY.pack(*entry) for entry in table))
+                self.text_file.seek(0)
+                shutil.copyfileobj(self.text_file, file)
+            os.replace(temp_path, self.path)
+        finally:
+            self.text_file.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+# Read-only view of a store file. Opening only maps the file and reads the book
+# names; each lookup touches just the index entries and bytes it needs, so startup
+# and lookup cost do not depend on the size of the corpus.
+class VerseStore:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.book_count, self.chapter_entry_count, self.verse_slot_count,
+         names_size, self.text_offset) = HEADER.unpack_from(self.data, 0)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            self.close()
+            raise ValueError(f"'{path}' is not a version {STORE_VERSION} verse store")
+        self.book_names = json.loads(self.data[HEADER.size:HEADER.size + names_size].decode('utf-8'))
+        self.book_index = {normalize_book_name(name): index for index, name in enumerate(self.book_names)}
+        self.book_table_offset = HEADER.size + names_size
+        self.chapter_table_offset = self.book_table_offset + TABLE_ENTRY.size * self.book_count
+        self.verse_slot_offset = self.chapter_table_offset + TABLE_ENTRY.size * self.chapter_entry_count
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _chapter_entry(self, book_name, chapter):
+        book_number = self.book_index.get(normalize_book_name(book_name))
+        if book_number is None:
+            raise KeyError(f"Book '{book_name}' not found.")
+        first_chapter, chapter_entries = TABLE_ENTRY.unpack_from(
+            self.data, self.book_table_offset + TABLE_ENTRY.size * book_number)
+        if not 0 <= chapter < chapter_entries:
+            raise KeyError(f"Chapter {chapter} not found in '{book_name}'.")
+        return TABLE_ENTRY.unpack_from(
+            self.data, self.chapter_table_offset + TABLE_ENTRY.size * (first_chapter + chapter))
+
+    def _slot_text(self, slot):
+        offset, length = TABLE_ENTRY.unpack_from(self.data, self.verse_slot_offset + TABLE_ENTRY.size * slot)
+        if offset == MISSING_OFFSET:
+            return None
+        start = self.text_offset + offset
+        return self.data[start:start + length].decode('utf-8')
+
+    # Highest chapter number of a book (chapters run from 0 or 1 up to it)
+    def chapter_count(self, book_name):
+        book_number = self.book_index.get(normalize_book_name(book_name))
+        if book_number is None:
+            raise KeyError(f"Book '{book_name}' not found.")
+        chapter_entries = TABLE_ENTRY.unpack_from(self.data, self.book_table_offset + TABLE_ENTRY.size * book_number)[1]
+        return max(chapter_entries - 1, 0)
+
+    def verse(self, book_name, chapter, verse):
+        first_slot, verse_slots = self._chapter_entry(book_name, chapter)
+        text = self._slot_text(first_slot + verse) if 0 <= verse < verse_slots else None
+        if text is None:
+            raise KeyError(f"Verse {book_name} {chapter}:{verse} not found.")
+        return text
+
+    # Return [(verse, text), ...] for a chapter (including a verse 0, if there is
+    # one), optionally limited to a verse range
+    def verses(self, book_name, chapter, first_verse=0, last_verse=None):
+        first_slot, verse_slots = self._chapter_entry(book_name, chapter)
+        last_verse = verse_slots - 1 if last_verse is None else min(last_verse, verse_slots - 1)
+        result = []
+        for verse in range(max(first_verse, 0), last_verse + 1):
+            text = self._slot_text(first_slot + verse)
+            if text is not None:
+                result.append((verse, text))
+        return result
+
+    # Resolve a textual reference: "John 3:16" returns the verse text, while
+    # "John 3" and "John 3:16-18" return [(verse, text), ...]
+    def lookup(self, reference):
+        match = REFERENCE_PATTERN.match(reference)
+        if not match:
+            raise ValueError(f"Could not parse reference '{reference}'.")
+        book_name, chapter, first_verse, last_verse = match.groups()
+        if first_verse is None:
+            return self.verses(book_name, int(chapter))
+        if last_verse is None:
+            return self.verse(book_name, int(chapter), int(first_verse))
+        return self.verses(book_name, int(chapter), int(first_verse), int(last_verse))
@@ -1,54 +1,225 @@
-# Import the Image module from the Pillow library
-from PIL import Image
-import os # Import os module for path joining if needed
-
-# --- Configuration ---
-# Specify the path to your input JPG image
-input_image_filename = 'github-logo.png'
-# Specify the desired output path for the favicon
-output_favicon_filename = 'favicon.ico'
-# Define the standard icon sizes required for a multi-resolution .ico file
-# Browsers and systems will pick the best size automatically.
-icon_sizes = [(16, 16), (24, 24), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
-# --- End Configuration ---
-
-# Construct full paths (assuming the script and image are in the same directory)
-# If they are in different directories, adjust current_dir or provide absolute paths.
-current_dir = os.path.dirname(os.path.abspath(__file__))
-input_image_path = os.path.join(current_dir, input_image_filename)
-output_favicon_path = os.path.join(current_dir, output_favicon_filename)
-
-try:
-    # Step 1: Load the source JPG image
-    print(f"Loading image from: {input_image_path}")
-    img = Image.open(input_image_path)
-
-    # Step 2: Ensure image is in RGBA format if transparency might be desired
-    # (JPG doesn't have transparency, but converting ensures consistency)
-    # If the source image has transparency (like a PNG), this preserves it.
-    # If it's JPG, it adds an alpha channel where everything is opaque.
-    # This step might not be strictly necessary if you know the source is opaque,
-    # but it's often safer for icon generation.
-    img = img.convert("RGBA")
-
-    # Step 3: Save the image as a multi-resolution ICO file
-    # The .save() method for the ICO format handles the resizing internally
-    # when provided with the 'sizes' argument. It typically uses a
-    # high-quality resampling filter like LANCZOS.
-    print(f"Saving favicon to: {output_favicon_path} with sizes: {icon_sizes}")
-    img.save(output_favicon_path, format='ICO', sizes=icon_sizes)
-
-    print("-" * 30)
-    print(f"Successfully generated '{output_favicon_filename}' from '{input_image_filename}'.")
-    print(f"Favicon saved at: {output_favicon_path}")
-    print("-" * 30)
-
-except FileNotFoundError:
-    print(f"Error: Input image not found at '{input_image_path}'")
-    print("Please ensure the image file exists and the path is correct.")
-except ImportError:
-    print("Error: Pillow library not found.")
-    print("Please install it using: pip install Pillow")
-except Exception as e:
-    # Catch other potential errors during image processing or saving
-    print(f"An unexpected error occurred: {e}")
+# Import the Image module from the Pillow library
+from PIL import Image, UnidentifiedImageError
+import hashlib
+import io
+import json
+import os # Import os module for path joining if needed
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool, cpu_count
+
+# --- Configuration ---
+# Specify the path to your input JPG image
+input_image_filename = 'github-logo.png'
+# Specify the desired output path for the favicon
+output_favicon_filename = 'favicon.ico'
+# Define the standard icon sizes required for a multi-resolution .ico file
+# Browsers and systems will pick the best size automatically.
+icon_sizes = [(16, 16), (24, 24), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
+
+# Batch mode: set batch_input to a directory of source images, or to a manifest file,
+# to build a full icon set per source instead of the single favicon above. A manifest
+# is either a JSON list of paths / {"source": path, "name": name} objects, or a text
+# file with one path per line. Relative paths are taken from the manifest's directory.
+batch_input = None # e.g. 'tenant_logos' or 'tenant_logos.json'
+# Every source gets its own <batch_output_directory>/<name>/ directory holding
+# favicon.ico, favicon-<w>x<h>.png for each of png_sizes and apple-touch-icon.png
+batch_output_directory = 'favicons'
+png_sizes = [(16, 16), (32, 32), (192, 192), (512, 512)]
+apple_touch_size = (180, 180)
+# iOS shows transparent areas of the apple-touch icon as black, so it is flattened
+# onto this background colour
+apple_touch_background = (255, 255, 255)
+# Number of worker processes (None = one per CPU core)
+batch_workers = None
+# --- End Configuration ---
+
+SOURCE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+# Written last into each output directory: the hash of the source and settings the
+# icon set was built from. A source is skipped while its stamp still matches.
+STAMP_FILENAME = '.source-hash'
+
+# Return [(source path, name), ...] for a directory of images or a manifest file
+def list_batch_sources(batch_input):
+    if os.path.isdir(batch_input):
+        return [(os.path.join(batch_input, filename), os.path.splitext(filename)[0])
+                for filename in sorted(os.listdir(batch_input))
+                if os.path.splitext(filename)[1].lower() in SOURCE_EXTENSIONS]
+
+    base_directory = os.path.dirname(os.path.abspath(batch_input))
+    with open(batch_input, 'r', encoding='utf-8') as file:
+        if batch_input.lower().endswith('.json'):
+            entries = json.load(file)
+        else:
+            entries = [line.strip() for line in file if line.strip() and not line.lstrip().startswith('#')]
+    sources = []
+    for entry in entries:
+        source, name = (entry['source'], entry.get('name')) if isinstance(entry, dict) else (entry, None)
+        source = os.path.join(base_directory, source)
+        sources.append((source, name or os.path.splitext(os.path.basename(source))[0]))
+    return sources
+
+# Output file name -> size for one icon set
+def icon_set_files(png_sizes, apple_touch_size):
+    files = {f"favicon-{width}x{height}.png": (width, height) for width, height in png_sizes}
+    files['apple-touch-icon.png'] = apple_touch_size
+    return files
+
+# Resize one decoded image to every size in sizes. Instead of resampling the full
+# image once per size, the sizes are produced largest first from a pyramid of
+# successive 2x box reductions, so each LANCZOS pass only covers less than a 2x step.
+# The work is done on premultiplied alpha so transparent edges do not bleed colour.
+def build_size_pyramid(image, sizes):
+    level = image.convert('RGBa')
+    resized = {}
+    for size in sorted(set(sizes), key=lambda size: size[0] * size[1], reverse=True):
+        while level.width >= 2 * size[0] and level.height >= 2 * size[1]:
+            level = level.reduce(2)
+        resized[size] = level.resize(size, Image.Resampling.LANCZOS).convert('RGBA')
+    return resized
+
+# Pad a non-square image onto a transparent square canvas so that every icon keeps
+# the source's aspect ratio
+def make_square(image):
+    if image.width == image.height:
+        return image
+    side = max(image.size)
+    square = Image.new('RGBA', (side, side), (0, 0, 0, 0))
+    square.paste(image, ((side - image.width) // 2, (side - image.height) // 2))
+    return square
+
+# Runs in the worker processes: build the icon set of one source. Returns
+# (name, status, message) with status 'built', 'skipped' or 'failed'.
+def build_icon_set(source, output_directory, icon_sizes, png_sizes, apple_touch_size, apple_touch_background):
+    source_path, name = source
+    target_directory = os.path.join(output_directory, name)
+    stamp_path = os.path.join(target_directory, STAMP_FILENAME)
+    png_files = icon_set_files(png_sizes, apple_touch_size)
+    try:
+        with open(source_path, 'rb') as file:
+            data = file.read()
+        digest = hashlib.blake2b(data, digest_size=16)
+        digest.update(repr((icon_sizes, png_sizes, apple_touch_size, apple_touch_background)).encode('utf-8'))
+        source_hash = digest.hexdigest()
+        try:
+            with open(stamp_path, 'r', encoding='utf-8') as file:
+                stamp = file.read().strip()
+        except OSError:
+            stamp = None
+        outputs = ['favicon.ico', *png_files]
+        if stamp == source_hash and all(os.path.exists(os.path.join(target_directory, output)) for output in outputs):
+            return name, 'skipped', None
+
+        # Decode once; every output is cut from the same pyramid
+        img = make_square(Image.open(io.BytesIO(data)).convert("RGBA"))
+        ico_sizes = [size for size in icon_sizes if size[0] <= img.width and size[1] <= img.height]
+        resized = build_size_pyramid(img, ico_sizes + list(png_files.values()))
+
+        os.makedirs(target_directory, exist_ok=True)
+        if os.path.exists(stamp_path):
+            os.remove(stamp_path) # Leave no stale stamp behind if writing fails part way
+        if ico_sizes:
+            # Every ICO size is supplied pre-resized, so Pillow only has to encode them
+            frames = [resized[size] for size in sorted(set(ico_sizes), reverse=True)]
+            frames[0].save(os.path.join(target_directory, 'favicon.ico'), format='ICO',
+                           sizes=ico_sizes, append_images=frames[1:])
+        else:
+            img.save(os.path.join(target_directory, 'favicon.ico'), format='ICO', sizes=[img.size])
+        for filename, size in png_files.items():
+            icon = resized[size]
+            if filename == 'apple-touch-icon.png':
+                background = Image.new('RGBA', size, tuple(apple_touch_background) + (255,))
+                icon = Image.alpha_composite(background, icon).convert('RGB')
+            icon.save(os.path.join(target_directory, filename), format='PNG')
+        with open(stamp_path, 'w', encoding='utf-8') as file:
+            file.write(source_hash)
+        return name, 'built', None
+    except UnidentifiedImageError:
+        return name, 'failed', f"'{source_path}' is not a readable image"
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return name, 'failed', f"'{source_path}': {e}"
+
+# Build the icon sets of every source across a process pool.
+# Returns {'built': n, 'skipped': n, 'failed': n}.
+def build_icon_sets(sources, output_directory, icon_sizes, png_sizes, apple_touch_size,
+                    apple_touch_background=(255, 255, 255), workers=None):
+    duplicates = sorted(name for name, count in Counter(name for _, name in sources).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Several sources would be written to the same output name: {', '.join(duplicates)}")
+
+    build = partial(build_icon_set, output_directory=output_directory, icon_sizes=icon_sizes, png_sizes=png_sizes,
+                    apple_touch_size=apple_touch_size, apple_touch_background=apple_touch_background)
+    workers = min(workers or cpu_count(), len(sources)) or 1
+    counts = {'built': 0, 'skipped': 0, 'failed': 0}
+    if workers == 1:
+        finished = map(build, sources)
+    else:
+        pool = Pool(processes=workers)
+        finished = pool.imap_unordered(build, sources)
+    try:
+        for name, status, message in finished:
+            counts[status] += 1
+            if status == 'failed':
+                print(f"Error: could not build icons for '{name}': {message}")
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+    return counts
+
+if __name__ == '__main__':
+    # Construct full paths (assuming the script and image are in the same directory)
+    # If they are in different directories, adjust current_dir or provide absolute paths.
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    if batch_input:
+        batch_input_path = os.path.join(current_dir, batch_input)
+        batch_output_path = os.path.join(current_dir, batch_output_directory)
+        try:
+            sources = list_batch_sources(batch_input_path)
+            print(f"Building icon sets for {len(sources)} images from '{batch_input_path}' into '{batch_output_path}'")
+            counts = build_icon_sets(sources, batch_output_path, icon_sizes, png_sizes, apple_touch_size,
+                                     apple_touch_background, batch_workers)
+            print("-" * 30)
+            print(f"Built {counts['built']}, skipped {counts['skipped']} unchanged, {counts['failed']} failed.")
+            print("-" * 30)
+        except (OSError, ValueError) as e:
+            print(f"Error: could not read batch input '{batch_input_path}': {e}")
+    else:
+        input_image_path = os.path.join(current_dir, input_image_filename)
+        output_favicon_path = os.path.join(current_dir, output_favicon_filename)
+
+        try:
+            # Step 1: Load the source JPG image
+            print(f"Loading image from: {input_image_path}")
+            img = Image.open(input_image_path)
+
+            # Step 2: Ensure image is in RGBA format if transparency might be desired
+            # (JPG doesn't have transparency, but converting ensures consistency)
+            # If the source image has transparency (like a PNG), this preserves it.
+            # If it's JPG, it adds an alpha channel where everything is opaque.
+            # This step might not be strictly necessary if you know the source is opaque,
+            # but it's often safer for icon generation.
+            img = img.convert("RGBA")
+
+            # Step 3: Save the image as a multi-resolution ICO file
+            # The .save() method for the ICO format handles the resizing internally
+            # when provided with the 'sizes' argument. It typically uses a
+            # high-quality resampling filter like LANCZOS.
+            print(f"Saving favicon to: {output_favicon_path} with sizes: {icon_sizes}")
+            img.save(output_favicon_path, format='ICO', sizes=icon_sizes)
+
+            print("-" * 30)
+            print(f"Successfully generated '{output_favicon_filename}' from '{input_image_filename}'.")
+            print(f"Favicon saved at: {output_favicon_path}")
+            print("-" * 30)
+
+        except FileNotFoundError:
+            print(f"Error: Input image not found at '{input_image_path}'")
+            print("Please ensure the image file exists and the path is correct.")
+        except ImportError:
+            print("Error: Pillow library not found.")
+            print("Please install it using: pip install Pillow")
+        except Exception as e:
+            # Catch other potential errors during image processing or saving
+            print(f"An unexpected error occurred: {e}")
@@ -1,19 +1,340 @@
-import qrcode
-
-# Your destination URL
-url = "https://github.com/"
-
-# Create QR code
-qr = qrcode.QRCode(
-    version=1,  # Controls size: 1 is smallest, 40 is largest
-    error_correction=qrcode.constants.ERROR_CORRECT_H,  # High error correction
-    box_size=10,  # Size of each "box" in the QR
-    border=4,  # Thickness of the border (minimum 4)
-)
-
-qr.add_data(url)
-qr.make(fit=True)
-
-# Create and save the image
-img = qr.make_image(fill_color="black", back_color="white")
-img.save("github_qr_code.png")
+import csv
+import json
+import os
+import re
+import zlib
+from collections import OrderedDict
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+
+import qrcode
+from PIL import Image
+
+# --- Configuration ---
+# Your destination URL
+url = "https://github.com/"
+
+# Batch mode: set batch_input to a CSV file (with a payload_column and an optional
+# name_column) or a JSONL file (one {"url": ..., "name": ...} object or plain string
+# per line) to encode every row instead of the single URL above.
+batch_input = None # e.g. 'tickets.csv' or 'tickets.jsonl'
+payload_column = 'url'
+name_column = 'name'
+# 'pdf': one multi-page PDF with the codes tiled on each page (batch_output is the file)
+# 'sprite': PNG sprite sheets plus a JSON index (batch_output is the file name prefix)
+# 'svg': one SVG file per code (batch_output is the directory)
+batch_output_format = 'pdf'
+batch_output = 'qr_codes.pdf'
+# Number of worker processes (None = one per CPU core)
+batch_workers = None
+# Encoded matrices are kept for this many distinct payloads, so repeated payloads
+# are only encoded once
+matrix_cache_size = 100000
+# --- End Configuration ---
+
+# Records are read and encoded in blocks of this many rows; the next block is
+# encoded by the workers while the current one is being written.
+BLOCK_SIZE = 4096
+PDF_PAGE_SIZE = (595, 842) # A4 in points
+DARK_RUN = re.compile(b'\x01+')
+MODULE_SHADES = bytes([255, 0]) + bytes(254) # 0 (light) -> white, 1 (dark) -> black
+UNSAFE_FILENAME_CHARACTERS = re.compile(r'[^\w.-]+')
+
+# Return (name, payload) for every row of a CSV or JSONL file, lazily. Names and
+# payloads are strings (JSON numbers and the like are converted); a missing or
+# empty name is None.
+def read_records(input_path, payload_column='url', name_column='name'):
+    with open(input_path, 'r', encoding='utf-8', newline='') as file:
+        if input_path.lower().endswith('.csv'):
+            for row in csv.DictReader(file):
+                yield row.get(name_column) or None, row[payload_column]
+            return
+        for line in file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, dict):
+                name = entry.get(name_column)
+                yield None if name is None or name == '' else str(name), str(entry[payload_column])
+            else:
+                yield None, str(entry)
+
+# Runs in the worker processes: encode one payload with the smallest version that
+# fits. Returns (modules per side, modules as one byte per module, 1 = dark),
+# without the quiet zone, which the writers add, or (None, error message) if the
+# payload cannot be encoded (e.g. it is too long even for version 40).
+def encode_payload(payload, error_correction=qrcode.constants.ERROR_CORRECT_H, version=1):
+    try:
+        qr = qrcode.QRCode(version=version, error_correction=error_correction, border=0)
+        qr.add_data(payload)
+        qr.make(fit=True)
+    except (qrcode.exceptions.DataOverflowError, ValueError) as e:
+        return None, f"does not fit in a QR code ({len(payload)} characters): {e}"
+    return qr.modules_count, bytes(cell for row in qr.modules for cell in row)
+
+# Horizontal runs of dark modules as (x, y, length)
+def dark_runs(encoded):
+    modules_count, modules = encoded
+    for y in range(modules_count):
+        for match in DARK_RUN.finditer(modules, y * modules_count, (y + 1) * modules_count):
+            yield match.start() - y * modules_count, y, match.end() - match.start()
+
+# Writes the codes tiled on A4 pages of a single PDF, as vector rectangles. Each
+# page is written out as soon as it is full, so memory does not grow with the
+# number of codes.
+class PdfSheetWriter:
+    def __init__(self, path, border=4, code_size=72, gap=18, margin=36, page_size=PDF_PAGE_SIZE):
+        self.path = path
+        self.border = border
+        self.code_size = code_size
+        self.gap = gap
+        self.margin = margin
+        self.page_size = page_size
+        self.columns = max(1, int((page_size[0] - 2 * margin + gap) // (code_size + gap)))
+        self.rows = max(1, int((page_size[1] - 2 * margin + gap) // (code_size + gap)))
+        self.temp_path = path + '.tmp'
+        self.file = open(self.temp_path, 'wb')
+        self.file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 3 # 1 is the catalog and 2 the page tree, written last
+        self.page_operations = []
+        self.slot = 0
+
+    def _write_object(self, object_id, body):
+        self.offsets[object_id] = self.file.tell()
+        self.file.write(b'%d 0 obj\n' % object_id + body + b'\nendobj\n')
+
+    def add(self, name, payload, encoded):
+        scale = self.code_size / (encoded[0] + 2 * self.border)
+        column, row = self.slot % self.columns, self.slot // self.columns
+        left = self.margin + column * (self.code_size + self.gap)
+        top = self.page_size[1] - self.margin - row * (self.code_size + self.gap)
+        # Draw in module units with the y axis pointing down, like the matrix
+        operations = self.page_operations
+        operations.append(f"q {scale:.5f} 0 0 {-scale:.5f} {left:.2f} {top:.2f} cm")
+        for x, y, length in dark_runs(encoded):
+            operations.append(f"{x + self.border} {y + self.border} {length} 1 re")
+        operations.append("f Q")
+        self.slot += 1
+        if self.slot == self.columns * self.rows:
+            self._write_page()
+
+    # Stop without writing the PDF, removing the partial file
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def _write_page(self):
+        content = zlib.compress('\n'.join(self.page_operations).encode('ascii'))
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self._write_object(content_id, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream'
+                           % (len(content), content))
+        self._write_object(page_id, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+                           b'/Resources << >> >>' % (self.page_size[0], self.page_size[1], content_id))
+        self.page_ids.append(page_id)
+        self.page_operations = []
+        self.slot = 0
+
+    def close(self):
+        if self.slot or not self.page_ids:
+            self._write_page()
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self.page_ids)
+        self._write_object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.page_ids)))
+        self._write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref_offset = self.file.tell()
+        self.file.write(b'xref\n0 %d\n0000000000 65535 f \n' % self.next_id)
+        for object_id in range(1, self.next_id):
+            self.file.write(b'%010d 00000 n \n' % self.offsets[object_id])
+        self.file.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.next_id, xref_offset))
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+        return len(self.page_ids)
+
+# Writes the codes into fixed-size cells of PNG sprite sheets (<prefix>-0001.png,
+# ...) and an index (<prefix>.json) giving the sheet and cell of every code. Each
+# code is drawn with the largest whole number of pixels per module that fits its cell.
+class SpriteSheetWriter:
+    def __init__(self, path_prefix, border=4, cell_size=330, columns=16, codes_per_sheet=256):
+        self.path_prefix = path_prefix
+        self.border = border
+        self.cell_size = cell_size
+        self.columns = columns
+        self.codes_per_sheet = codes_per_sheet
+        self.sheet = None
+        self.sheet_count = 0
+        self.slot = 0
+        self.index = []
+
+    def _sheet_path(self, sheet_number):
+        return f"{self.path_prefix}-{sheet_number:04d}.png"
+
+    def add(self, name, payload, encoded):
+        modules_count, modules = encoded
+        box_size = self.cell_size // (modules_count + 2 * self.border)
+        if box_size < 1:
+            raise ValueError(f"A {modules_count}x{modules_count} code does not fit a {self.cell_size} px sprite cell")
+        if self.sheet is None:
+            rows = -(-self.codes_per_sheet // self.columns)
+            self.sheet = Image.new('L', (self.columns * self.cell_size, rows * self.cell_size), 255)
+            self.sheet_count += 1
+        code = Image.frombytes('L', (modules_count, modules_count), modules.translate(MODULE_SHADES))
+        code = code.resize((modules_count * box_size, modules_count * box_size), Image.Resampling.NEAREST)
+        x = (self.slot % self.columns) * self.cell_size
+        y = (self.slot // self.columns) * self.cell_size
+        offset = (self.cell_size - modules_count * box_size) // 2
+        self.sheet.paste(code, (x + offset, y + offset))
+        self.index.append({'name': name, 'payload': payload, 'sheet': os.path.basename(self._sheet_path(self.sheet_count)),
+                           'x': x, 'y': y, 'size': self.cell_size})
+        self.slot += 1
+        if self.slot == self.codes_per_sheet:
+            self._write_sheet()
+
+    # Stop without writing the index; sheets already written are left in place
+    def abort(self):
+        self.sheet = None
+
+    def _write_sheet(self):
+        self.sheet.save(self._sheet_path(self.sheet_count), format='PNG')
+        self.sheet = None
+        self.slot = 0
+
+    def close(self):
+        if self.sheet is not None:
+            self._write_sheet()
+        with open(self.path_prefix + '.json', 'w', encoding='utf-8') as file:
+            json.dump(self.index, file, ensure_ascii=False)
+        return self.sheet_count
+
+# Writes one SVG file per code into a directory, named after the record's name (or
+# its number among the codes written). A name that is already taken (also after replacing
+# unsafe characters, and ignoring case) gets that number appended.
+# Dark modules are drawn as a single path.
+class SvgSetWriter:
+    def __init__(self, directory, border=4, box_size=10):
+        self.directory = directory
+        self.border = border
+        self.box_size = box_size
+        self.count = 0
+        self.filenames = set()
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, name, payload, encoded):
+        self.count += 1
+        size = encoded[0] + 2 * self.border
+        path = ''.join(f"M{x + self.border} {y + self.border}h{length}v1h-{length}z"
+                       for x, y, length in dark_runs(encoded))
+        svg = (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" width="{size * self.box_size}" '
+               f'height="{size * self.box_size}" shape-rendering="crispEdges">'
+               f'<rect width="{size}" height="{size}" fill="#fff"/><path fill="#000" d="{path}"/></svg>\n')
+        filename = UNSAFE_FILENAME_CHARACTERS.sub('_', name) if name else f"{self.count:06d}"
+        if filename.casefold() in self.filenames:
+            filename = f"{filename}-{self.count:06d}"
+            while filename.casefold() in self.filenames:
+                filename += '_'
+        self.filenames.add(filename.casefold())
+        with open(os.path.join(self.directory, filename + '.svg'), 'w', encoding='utf-8') as file:
+            file.write(svg)
+
+    def close(self):
+        return self.count
+
+    def abort(self):
+        pass
+
+def create_writer(output_format, output_path, border=4, box_size=10):
+    if output_format == 'pdf':
+        return PdfSheetWriter(output_path, border)
+    if output_format == 'sprite':
+        return SpriteSheetWriter(output_path, border)
+    if output_format == 'svg':
+        return SvgSetWriter(output_path, border, box_size)
+    raise ValueError(f"Unknown output format '{output_format}' (expected 'pdf', 'sprite' or 'svg')")
+
+# Encode every (name, payload) record across a process pool and hand the codes to
+# writer.add() in input order. Payloads already in cache (an OrderedDict of
+# payload -> encoded matrix, kept to cache_size entries) are not encoded again.
+# Records that cannot be encoded or written are reported and skipped.
+# Returns {'written': n, 'failed': n}.
+def generate_codes(records, writer, workers=None, cache=None, cache_size=100000,
+                   error_correction=qrcode.constants.ERROR_CORRECT_H, version=1):
+    cache = OrderedDict() if cache is None else cache
+    encode = partial(encode_payload, error_correction=error_correction, version=version)
+    workers = workers or cpu_count()
+    pool = Pool(processes=workers) if workers > 1 else None
+
+    # Look up what the cache already holds when the block is submitted, so entries
+    # evicted while the previous block is written are not needed any more
+    def submit(block):
+        known = {}
+        for _, payload in block:
+            if payload in cache:
+                known[payload] = cache[payload]
+                cache.move_to_end(payload)
+        missing = list(dict.fromkeys(payload for _, payload in block if payload not in known))
+        if pool is None:
+            return block, known, missing, list(map(encode, missing))
+        chunksize = max(1, len(missing) // (4 * workers))
+        return block, known, missing, pool.map_async(encode, missing, chunksize)
+
+    records = iter(records)
+    counts = {'written': 0, 'failed': 0}
+    record_number = 0
+    try:
+        pending = submit(list(islice(records, BLOCK_SIZE)))
+        while pending[0]:
+            block, known, missing, results = pending
+            # Start encoding the next block before writing this one
+            pending = submit(list(islice(records, BLOCK_SIZE)))
+            results = results if pool is None else results.get()
+            for payload, encoded in zip(missing, results):
+                known[payload] = cache[payload] = encoded
+            while len(cache) > cache_size:
+                cache.popitem(last=False)
+            for name, payload in block:
+                record_number += 1
+                encoded = known[payload]
+                try:
+                    if encoded[0] is None:
+                        raise ValueError(encoded[1])
+                    writer.add(name, payload, encoded)
+                    counts['written'] += 1
+                except ValueError as e:
+                    counts['failed'] += 1
+                    print(f"Error: could not create the QR code of record {record_number} ({name or payload[:40]!r}): {e}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return counts
+
+if __name__ == '__main__':
+    if batch_input:
+        writer = create_writer(batch_output_format, batch_output)
+        try:
+            counts = generate_codes(read_records(batch_input, payload_column, name_column), writer,
+                                    batch_workers, cache_size=matrix_cache_size)
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        print(f"Wrote {counts['written']} QR codes from '{batch_input}' to '{batch_output}' ({batch_output_format}), "
+              f"{counts['failed']} failed.")
+    else:
+        # Create QR code
+        qr = qrcode.QRCode(
+            version=1,  # Controls size: 1 is smallest, 40 is largest
+            error_correction=qrcode.constants.ERROR_CORRECT_H,  # High error correction
+            box_size=10,  # Size of each "box" in the QR
+            border=4,  # Thickness of the border (minimum 4)
+        )
+
+        qr.add_data(url)
+        qr.make(fit=True)
+
+        # Create and save the image
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save("github_qr_code.png")
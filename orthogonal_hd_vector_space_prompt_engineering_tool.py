@@ -1,64 +1,480 @@
-import numpy as np
-import hashlib
-
-# Define a class for managing orthogonal prompt vectors
-class OrthogonalPromptEngine:
-    def __init__(self, dimensions=128):
-        self.dimensions = dimensions
-        self.trait_vectors = {}
-
-    def vectorize_trait(self, trait):
-        vec = np.zeros(self.dimensions, dtype=float)
-        padded = f"^{trait}$"
-        for i in range(len(padded) - 2):
-            ngram = padded[i:i+3]
-            h = int(hashlib.md5(ngram.encode()).hexdigest(), 16)
-            idx = h % self.dimensions
-            vec[idx] += 1
-        normalized_vec = vec / np.linalg.norm(vec)
-        return normalized_vec
-
-    def add_trait(self, name, trait_description):
-        if name in self.trait_vectors:
-            raise ValueError(f"Trait '{name}' already exists.")
-        vector = self.vectorize_trait(trait_description)
-        self.trait_vectors[name] = vector
-
-    def generate_prompt(self, selected_traits):
-        prompt_vector = np.zeros(self.dimensions, dtype=float)
-        for trait in selected_traits:
-            if trait not in self.trait_vectors:
-                raise ValueError(f"Trait '{trait}' not found.")
-            prompt_vector += self.trait_vectors[trait]
-
-        # Normalize prompt vector
-        prompt_vector /= np.linalg.norm(prompt_vector)
-
-        return prompt_vector
-
-    def similarity(self, trait_a, trait_b):
-        vec_a = self.trait_vectors.get(trait_a)
-        vec_b = self.trait_vectors.get(trait_b)
-        if vec_a is None or vec_b is None:
-            raise ValueError("One or both traits not found.")
-        return np.dot(vec_a, vec_b)
-
-
-# Example Usage
-if __name__ == "__main__":
-    engine = OrthogonalPromptEngine(dimensions=256)
-
-    # Add orthogonal traits
-    engine.add_trait("melancholic", "deep sadness and reflective mood")
-    engine.add_trait("hopeful", "optimistic resilience despite challenges")
-    engine.add_trait("acoustic_style", "minimalist acoustic instrumentation")
-
-    # Generate engineered prompt
-    selected = ["melancholic", "hopeful", "acoustic_style"]
-    prompt_vec = engine.generate_prompt(selected)
-
-    print("Engineered Prompt Vector:", prompt_vec)
-
-    # Check similarity between traits
-    similarity_score = engine.similarity("melancholic", "hopeful")
-    print(f"Similarity between 'melancholic' and 'hopeful': {similarity_score:.4f}")
+import numpy as np
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+
+# Stable n-gram hashes (the same in every process, unlike hash()). 'md5' is the
+# original scheme; 'crc32' is much cheaper but gives different buckets, so vectors
+# built with one scheme must not be mixed with vectors built with the other.
+NGRAM_HASHES = {
+    'md5': lambda data: int.from_bytes(hashlib.md5(data).digest(), 'big'),
+    'crc32': zlib.crc32,
+}
+
+# Optional dependency, only needed for vectorize_traits(..., sparse=True)
+try:
+    from scipy import sparse as scipy_sparse
+except ImportError:
+    scipy_sparse = None
+
+# Trait store file (OrthogonalPromptEngine.save / .load), little-endian:
+#   magic, format version, JSON header length, JSON header (dimensions, n-gram
+#   hash, trait count and the offsets below), zero padding up to STORE_HEADER_SIZE
+#   trait matrix   float32 [count, dimensions], page aligned for np.memmap
+#   name offsets   uint64 [count + 1], byte offsets of each row's name in the blob
+#   sorted rows    uint32 [count], rows ordered by name (UTF-8 bytes) for lookups
+#   name blob      UTF-8 names, in row order
+# Everything is used in place from the memory map, so opening a store costs the
+# same for ten traits as for a million and worker processes share one page-cached
+# copy of it.
+STORE_MAGIC = b'OPEV'
+STORE_VERSION = 1
+STORE_HEADER_SIZE = 4096
+STORE_PREFIX = struct.Struct('<4sII')
+
+# Row -> name sequence over the name table of a memory-mapped trait store, with
+# name -> row lookups by binary search over the sorted rows
+class MappedTraitNames(Sequence):
+    def __init__(self, data, header):
+        self.data = data
+        self.count = header['count']
+        self.name_offsets = np.frombuffer(data, dtype='<u8', count=self.count + 1, offset=header['name_offsets_offset'])
+        self.sorted_rows = np.frombuffer(data, dtype='<u4', count=self.count, offset=header['sorted_rows_offset'])
+        self.names_offset = header['names_offset']
+
+    def _name_bytes(self, row):
+        start = self.names_offset + int(self.name_offsets[row])
+        return self.data[start:self.names_offset + int(self.name_offsets[row + 1])]
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(self.count))]
+        if row < 0:
+            row += self.count
+        if not 0 <= row < self.count:
+            raise IndexError(row)
+        return self._name_bytes(row).decode('utf-8')
+
+    def __len__(self):
+        return self.count
+
+    def row_of(self, name):
+        if not isinstance(name, str):
+            return None
+        key = name.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_bytes(int(self.sorted_rows[middle])) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            row = int(self.sorted_rows[low])
+            if self._name_bytes(row) == key:
+                return row
+        return None
+
+# Name -> row mapping on top of MappedTraitNames, standing in for the trait_index dict
+class MappedTraitIndex(Mapping):
+    def __init__(self, names):
+        self.names = names
+
+    def __getitem__(self, name):
+        row = self.names.row_of(name)
+        if row is None:
+            raise KeyError(name)
+        return row
+
+    def __contains__(self, name):
+        return self.names.row_of(name) is not None
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+# Read-only name -> vector mapping over the rows of the engine's trait matrix, so
+# code written against the old dict of per-trait arrays keeps working
+class TraitVectorView(Mapping):
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __getitem__(self, name):
+        return self.engine.vectors[self.engine.trait_index[name]]
+
+    def __iter__(self):
+        return iter(self.engine.trait_names)
+
+    def __len__(self):
+        return len(self.engine.trait_names)
+
+# Approximate nearest-neighbour index over an engine's trait vectors (an inverted
+# file, "IVF"): the vectors are split into `lists` clusters around centroids found
+# by a few rounds of spherical k-means on a sample, and a query only scores the
+# traits of the `probes` clusters whose centroids are closest to it. More probes
+# means better recall and slower queries; probes == lists is an exact search.
+# Each cluster keeps its own contiguous copy of its vectors, so a probe is one
+# small matrix product instead of a gather from the whole matrix (at the cost of
+# holding the vectors twice). Traits added to the engine after the index is built
+# are assigned to their nearest centroid as they arrive, without retraining.
+class TraitANNIndex:
+    def __init__(self, engine, lists=None, probes=16, training_sample=None, iterations=10, seed=0):
+        self.engine = engine
+        self.probes = probes
+        count = len(engine.trait_names)
+        self.lists = max(1, min(lists or int(np.sqrt(count)), count))
+        self.list_rows = [np.zeros(0, dtype=np.intp)] * self.lists
+        self.list_vectors = [np.zeros((0, engine.dimensions), dtype=np.float32)] * self.lists
+        self._train(training_sample or 32 * self.lists, iterations, np.random.default_rng(seed))
+        self.add(np.arange(count))
+
+    def _train(self, sample_size, iterations, rng):
+        vectors = self.engine.vectors
+        sample_rows = np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))
+        sample = np.nan_to_num(np.asarray(vectors[sample_rows], dtype=np.float32))
+        centroids = sample[rng.choice(len(sample), self.lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Keep the old centroid for clusters that lost all their members
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        self.centroids = centroids
+
+    # Index engine rows that were added after the index was built
+    def add(self, rows, chunk_size=8192):
+        rows = np.asarray(rows, dtype=np.intp)
+        vectors = self.engine.vectors
+        for start in range(0, len(rows), chunk_size):
+            chunk_rows = rows[start:start + chunk_size]
+            chunk = np.nan_to_num(np.asarray(vectors[chunk_rows], dtype=np.float32))
+            assignment = np.argmax(chunk @ self.centroids.T, axis=1)
+            order = np.argsort(assignment, kind='stable')
+            bounds = np.searchsorted(assignment[order], np.arange(self.lists + 1))
+            for list_number in np.unique(assignment).tolist():
+                members = order[bounds[list_number]:bounds[list_number + 1]]
+                self.list_rows[list_number] = np.concatenate((self.list_rows[list_number], chunk_rows[members]))
+                self.list_vectors[list_number] = np.concatenate((self.list_vectors[list_number], chunk[members]))
+
+    # Up to k (rows, scores) closest to query, best first. exclude_row is skipped.
+    def search(self, query, k=10, probes=None, exclude_row=None):
+        query = np.asarray(query, dtype=np.float32)
+        probes = min(probes or self.probes, self.lists)
+        nearest_lists = np.argpartition(-(self.centroids @ query), probes - 1)[:probes].tolist()
+        candidates = np.concatenate([self.list_rows[list_number] for list_number in nearest_lists])
+        scores = np.concatenate([self.list_vectors[list_number] @ query for list_number in nearest_lists])
+        if exclude_row is not None:
+            excluded = candidates == exclude_row
+            scores[excluded] = -np.inf
+            k = min(k, len(candidates) - int(excluded.any()))
+        k = min(k, len(candidates))
+        if k <= 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return candidates[top], scores[top]
+
+# Define a class for managing orthogonal prompt vectors
+class OrthogonalPromptEngine:
+    def __init__(self, dimensions=128, initial_capacity=1024, ngram_hash='md5', ngram_cache_size=1 << 16):
+        self.dimensions = dimensions
+        if ngram_hash not in NGRAM_HASHES:
+            raise ValueError(f"Unknown n-gram hash '{ngram_hash}'.")
+        self.ngram_hash = ngram_hash
+        self.ngram_cache_size = ngram_cache_size
+        self._init_ngram_bucket()
+        # Trait vectors live in the rows of one contiguous float32 matrix that grows
+        # by doubling; trait_index maps a trait name to its row
+        self.matrix = np.zeros((initial_capacity, dimensions), dtype=np.float32)
+        self.trait_index = {}
+        self.trait_names = []
+        # Optional approximate nearest-neighbour index, see build_ann_index()
+        self.ann_index = None
+
+    def _init_ngram_bucket(self):
+        # Trigram -> bucket, memoized: a vocabulary has far fewer distinct trigrams
+        # than trigram occurrences, so most lookups skip hashing entirely
+        hash_function, dimensions = NGRAM_HASHES[self.ngram_hash], self.dimensions
+        self.ngram_bucket = lru_cache(maxsize=self.ngram_cache_size)(
+            lambda ngram: hash_function(ngram.encode()) % dimensions)
+
+    # The memoized bucket function cannot be pickled, so it is left out and rebuilt
+    # (empty) on unpickling, e.g. when an engine is sent to a worker process
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['ngram_bucket']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_ngram_bucket()
+
+    @property
+    def vectors(self):
+        return self.matrix[:len(self.trait_names)]
+
+    @property
+    def trait_vectors(self):
+        return TraitVectorView(self)
+
+    def _reserve(self, count):
+        # An engine opened from a store is read-only until it is first changed:
+        # then it moves its names and vectors into ordinary in-memory structures
+        if not isinstance(self.trait_names, list):
+            self.trait_names = list(self.trait_names)
+            self.trait_index = {name: row for row, name in enumerate(self.trait_names)}
+        needed = len(self.trait_names) + count
+        if needed > self.matrix.shape[0] or isinstance(self.matrix, np.memmap):
+            capacity = max(needed, 2 * self.matrix.shape[0], 1)
+            matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+            matrix[:len(self.trait_names)] = self.vectors
+            self.matrix = matrix
+
+    # Write the traits to a store file (see STORE_MAGIC) that load() can memory-map
+    def save(self, path):
+        count = len(self.trait_names)
+        encoded = [name.encode('utf-8') for name in self.trait_names]
+        name_offsets = np.zeros(count + 1, dtype='<u8')
+        np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+        sorted_rows = np.array(sorted(range(count), key=encoded.__getitem__), dtype='<u4')
+
+        matrix_offset = STORE_HEADER_SIZE
+        name_offsets_offset = matrix_offset + 4 * count * self.dimensions
+        sorted_rows_offset = name_offsets_offset + name_offsets.nbytes
+        header = json.dumps({
+            'dimensions': self.dimensions, 'ngram_hash': self.ngram_hash, 'count': count,
+            'matrix_offset': matrix_offset, 'name_offsets_offset': name_offsets_offset,
+            'sorted_rows_offset': sorted_rows_offset, 'names_offset': sorted_rows_offset + sorted_rows.nbytes,
+        }).encode('utf-8')
+        prefix = STORE_PREFIX.pack(STORE_MAGIC, STORE_VERSION, len(header)) + header
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(prefix.ljust(STORE_HEADER_SIZE, b'\0'))
+            file.write(np.ascontiguousarray(self.vectors, dtype='<f4').tobytes())
+            file.write(name_offsets.tobytes())
+            file.write(sorted_rows.tobytes())
+            file.write(b''.join(encoded))
+        os.replace(temp_path, path)
+
+    # Open a store file written by save(). With memory_map=True (the default) the matrix
+    # and name table stay in the file's memory map and are shared between every
+    # process that opens it; the engine copies them only when traits are added.
+    @classmethod
+    def load(cls, path, memory_map=True):
+        with open(path, 'rb') as file:
+            if memory_map:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = file.read()
+        magic, version, header_size = STORE_PREFIX.unpack_from(data, 0)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            raise ValueError(f"'{path}' is not a version {STORE_VERSION} trait store.")
+        header = json.loads(bytes(data[STORE_PREFIX.size:STORE_PREFIX.size + header_size]))
+
+        engine = cls(header['dimensions'], initial_capacity=0, ngram_hash=header['ngram_hash'])
+        shape = (header['count'], header['dimensions'])
+        if memory_map and header['count']:
+            engine.matrix = np.memmap(path, dtype='<f4', mode='r', offset=header['matrix_offset'], shape=shape)
+        else:
+            engine.matrix = np.frombuffer(data, dtype='<f4', count=shape[0] * shape[1],
+                                          offset=header['matrix_offset']).reshape(shape).astype(np.float32)
+        engine.trait_names = MappedTraitNames(data, header)
+        engine.trait_index = MappedTraitIndex(engine.trait_names)
+        return engine
+
+    def _rows(self, traits):
+        try:
+            return np.fromiter((self.trait_index[trait] for trait in traits), dtype=np.intp)
+        except KeyError as e:
+            raise ValueError(f"Trait '{e.args[0]}' not found.") from None
+
+    def _query_vector(self, query):
+        if isinstance(query, str):
+            return self.vectors[self._rows([query])[0]]
+        return np.asarray(query, dtype=np.float32)
+
+    def vectorize_trait(self, trait):
+        padded = f"^{trait}$"
+        buckets = [self.ngram_bucket(padded[i:i+3]) for i in range(len(padded) - 2)]
+        vec = np.bincount(buckets, minlength=self.dimensions).astype(float)
+        normalized_vec = vec / np.linalg.norm(vec)
+        return normalized_vec
+
+    # Bucket ids of every trigram of every description, and how many each has.
+    # Trigrams are packed into int64 keys (three 21-bit code points) with NumPy so
+    # that only the distinct trigrams of the batch go through the hash function.
+    def _trait_buckets(self, descriptions):
+        padded = [f"^{trait}$" for trait in descriptions]
+        lengths = np.fromiter((len(text) for text in padded), dtype=np.int64, count=len(padded))
+        counts = lengths - 2
+        codes = np.frombuffer(''.join(padded).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+        # Start of every trigram inside the joined text (none crosses two descriptions)
+        first_trigram = np.cumsum(counts) - counts
+        text_starts = np.cumsum(lengths) - lengths
+        positions = np.arange(counts.sum()) + np.repeat(text_starts - first_trigram, counts)
+        keys = (codes[positions] << 42) | (codes[positions + 1] << 21) | codes[positions + 2]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        bucket = self.ngram_bucket
+        mask = (1 << 21) - 1
+        unique_buckets = np.fromiter(
+            (bucket(chr(key >> 42) + chr((key >> 21) & mask) + chr(key & mask)) for key in unique_keys.tolist()),
+            dtype=np.int64, count=len(unique_keys))
+        return unique_buckets[inverse.ravel()], counts
+
+    # Batched vectorize_trait: a (len(descriptions), dimensions) float32 matrix of
+    # normalized vectors, written into out when given. With sparse=True a
+    # scipy.sparse CSR matrix is returned instead, which suits a large dimensions.
+    def vectorize_traits(self, descriptions, out=None, sparse=False):
+        buckets, counts = self._trait_buckets(descriptions)
+        rows = np.repeat(np.arange(len(counts)), counts)
+        if sparse:
+            if scipy_sparse is None:
+                raise ImportError("vectorize_traits(sparse=True) needs SciPy: pip install scipy")
+            matrix = scipy_sparse.csr_matrix(
+                (np.ones(len(buckets), dtype=np.float32), (rows, buckets)), shape=(len(counts), self.dimensions))
+            matrix.sum_duplicates()
+            norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+            return scipy_sparse.diags(1 / norms).dot(matrix).tocsr().astype(np.float32)
+        # One bincount over flattened (row, bucket) positions builds every count at once
+        flat = np.bincount(rows * self.dimensions + buckets, minlength=len(counts) * self.dimensions)
+        matrix = flat.reshape(len(counts), self.dimensions).astype(np.float32, copy=False)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        if out is None:
+            return matrix
+        out[...] = matrix
+        return out
+
+    def add_trait(self, name, trait_description):
+        if name in self.trait_index:
+            raise ValueError(f"Trait '{name}' already exists.")
+        vector = self.vectorize_trait(trait_description)
+        self._reserve(1)
+        self.matrix[len(self.trait_names)] = vector
+        self.trait_index[name] = len(self.trait_names)
+        self.trait_names.append(name)
+        if self.ann_index is not None:
+            self.ann_index.add([len(self.trait_names) - 1])
+
+    # Batched add_trait. Descriptions are vectorized in chunks straight into the
+    # trait matrix, so memory stays bounded for very large catalogues.
+    def add_traits(self, names, trait_descriptions, chunk_size=10000):
+        names = list(names)
+        trait_descriptions = list(trait_descriptions)
+        if len(names) != len(trait_descriptions):
+            raise ValueError("names and trait_descriptions must have the same length.")
+        seen = set()
+        for name in names:
+            if name in self.trait_index or name in seen:
+                raise ValueError(f"Trait '{name}' already exists.")
+            seen.add(name)
+
+        self._reserve(len(names))
+        first_row = len(self.trait_names)
+        for start in range(0, len(names), chunk_size):
+            chunk = trait_descriptions[start:start + chunk_size]
+            self.vectorize_traits(chunk, out=self.matrix[first_row + start:first_row + start + len(chunk)])
+        for row, name in enumerate(names, first_row):
+            self.trait_index[name] = row
+        self.trait_names.extend(names)
+        if self.ann_index is not None:
+            self.ann_index.add(np.arange(first_row, len(self.trait_names)))
+
+    # Build an approximate nearest-neighbour index (TraitANNIndex) used by
+    # nearest_traits from now on. It is kept up to date as traits are added.
+    def build_ann_index(self, lists=None, probes=16, **options):
+        if not self.trait_names:
+            raise ValueError("Add traits before building the index.")
+        self.ann_index = TraitANNIndex(self, lists, probes, **options)
+        return self.ann_index
+
+    def generate_prompt(self, selected_traits):
+        prompt_vector = self.vectors[self._rows(selected_traits)].sum(axis=0)
+
+        # Normalize prompt vector
+        prompt_vector /= np.linalg.norm(prompt_vector)
+
+        return prompt_vector
+
+    # Batched generate_prompt: one normalized prompt vector (row) per selection
+    def generate_prompts(self, selections):
+        selections = [list(selected) for selected in selections]
+        if not selections:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        lengths = np.fromiter((len(selected) for selected in selections), dtype=np.intp, count=len(selections))
+        if not lengths.all():
+            raise ValueError("Every selection needs at least one trait.")
+        rows = self._rows(trait for selected in selections for trait in selected)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        prompt_vectors = np.add.reduceat(self.vectors[rows], offsets, axis=0)
+        prompt_vectors /= np.linalg.norm(prompt_vectors, axis=1, keepdims=True)
+        return prompt_vectors
+
+    def similarity(self, trait_a, trait_b):
+        row_a = self.trait_index.get(trait_a)
+        row_b = self.trait_index.get(trait_b)
+        if row_a is None or row_b is None:
+            raise ValueError("One or both traits not found.")
+        return np.dot(self.matrix[row_a], self.matrix[row_b])
+
+    # All-pairs similarity of the given traits (default: every trait) as one matmul
+    def similarity_matrix(self, traits=None):
+        vectors = self.vectors if traits is None else self.vectors[self._rows(traits)]
+        return vectors @ vectors.T
+
+    # Similarity of a trait name or a vector against every stored trait, in row order
+    def similarities(self, query):
+        return self.vectors @ self._query_vector(query)
+
+    # The k stored traits most similar to a trait name or vector, as (name, score)
+    # pairs, best first. A trait name is not returned as its own neighbour. Uses the
+    # ANN index when one was built, unless exact=True; probes overrides its setting.
+    def nearest_traits(self, query, k=10, exact=False, probes=None):
+        if self.ann_index is not None and not exact:
+            exclude_row = self.trait_index.get(query) if isinstance(query, str) else None
+            if isinstance(query, str) and exclude_row is None:
+                raise ValueError(f"Trait '{query}' not found.")
+            rows, scores = self.ann_index.search(self._query_vector(query), k, probes, exclude_row)
+            return [(self.trait_names[row], float(score)) for row, score in zip(rows.tolist(), scores.tolist())]
+
+        scores = self.similarities(query)
+        if isinstance(query, str):
+            scores[self.trait_index[query]] = -np.inf
+        k = min(k, len(scores) - isinstance(query, str))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.trait_names[row], float(scores[row])) for row in top]
+
+
+# Example Usage
+if __name__ == "__main__":
+    engine = OrthogonalPromptEngine(dimensions=256)
+
+    # Add orthogonal traits
+    engine.add_trait("melancholic", "deep sadness and reflective mood")
+    engine.add_trait("hopeful", "optimistic resilience despite challenges")
+    engine.add_trait("acoustic_style", "minimalist acoustic instrumentation")
+
+    # Generate engineered prompt
+    selected = ["melancholic", "hopeful", "acoustic_style"]
+    prompt_vec = engine.generate_prompt(selected)
+
+    print("Engineered Prompt Vector:", prompt_vec)
+
+    # Check similarity between traits
+    similarity_score = engine.similarity("melancholic", "hopeful")
+    print(f"Similarity between 'melancholic' and 'hopeful': {similarity_score:.4f}")
+
+    # Batch queries over the whole trait matrix
+    print("All-pairs similarity:\n", engine.similarity_matrix())
+    print("Traits closest to the engineered prompt:", engine.nearest_traits(prompt_vec, k=2))